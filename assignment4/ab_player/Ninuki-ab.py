@@ -11,8 +11,21 @@ from board_base import DEFAULT_SIZE, GO_POINT, GO_COLOR
 from board import GoBoard
 from board_util import GoBoardUtil
 from engine import GoEngine
+from pn_search import PNSearch
+from move_ordering import MoveOrdering
+from time_manager import TimeManager
+from transposition_table import (
+    TranspositionTable,
+    EXACT,
+    LOWER_BOUND,
+    UPPER_BOUND,
+    SOLVED_DEPTH
+)
 import time
 import random
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
 from board_base import (
     BLACK,
     WHITE,
@@ -25,6 +38,43 @@ from board_base import (
     opponent
 )
 
+"""
+Share of the time limit given to proof-number search of forcing moves
+before alpha-beta
+"""
+PN_TIME_FRACTION = 0.1
+"""
+Half width of the aspiration window around the value of the previous
+iteration. heuristic_eval changes in steps of 0.01,
+and NULL_WINDOW is smaller than that step.
+"""
+ASPIRATION_WINDOW = 0.25
+NULL_WINDOW = 0.005
+"""
+Maximum number of forcing moves played by quiescence below max_depth
+"""
+MAX_QUIESCENCE_DEPTH = 8
+"""
+Seconds between two checks of the workers of parallel_solve
+"""
+POLL_INTERVAL = 0.005
+"""
+Status of a worker of parallel_solve in its result row
+"""
+RUNNING = 0
+SOLVED = 1
+STOPPED = 2
+"""
+Columns of the result row of a worker of parallel_solve: its status,
+the value and best move of its search, and the depth of its deepest
+finished iteration
+"""
+STATUS = 0
+VALUE = 1
+MOVE = 2
+DEPTH = 3
+NUM_RESULTS = 4
+
 
 class ABPlayer(GoEngine):
     def __init__(self) -> None:
@@ -34,6 +84,11 @@ class ABPlayer(GoEngine):
         """
         GoEngine.__init__(self, "Go0", 1.0)
         self.time_limit = 1
+        self.pn_search = PNSearch()
+        self.tt = TranspositionTable()
+        self.move_ordering = MoveOrdering()
+        self.time_manager = TimeManager()
+        self.num_workers = 1
 
     def get_move(self, board: GoBoard, color: GO_COLOR) -> GO_POINT:
         if board.get_empty_points().size == 0:
@@ -46,7 +101,17 @@ class ABPlayer(GoEngine):
         return format_point(point_to_coord(self.best_move, self.board.size)).lower()
 
     def alpha_beta(self, alpha, beta, depth):
-        if time.time() - self.solve_start_time > (self.time_limit - 0.01):
+        """
+        Principal variation search of self.board for the player to move,
+        to self.max_depth. Positions at the depth limit are searched by
+        quiescence, and get values strictly between a loss (-1) and a win (1)
+        unless a forced result is found there.
+        Returns (value, solved, timeout). solved tells whether value is a
+        proven bound that does not depend on the depth limit.
+        Results are stored in the transposition table. Its best move is
+        searched first, then the moves in the order of self.move_ordering.
+        """
+        if self.time_manager.out_of_time():
             return 0, False, True
 
         is_terminal, winner = self.board.is_terminal()
@@ -59,58 +124,299 @@ class ABPlayer(GoEngine):
                 return 0, True, False
 
         if depth >= self.max_depth:
-            return 0, False, False
+            return self.quiescence(alpha, beta, 0)
+
+        key = self.board.zobrist_key()
+        remaining = self.max_depth - depth
+        tt_move = PASS
+        entry = self.tt.lookup(key)
+        if entry is not None:
+            value, flag, entry_depth, tt_move = entry
+            if depth > 0 and entry_depth >= remaining and (
+                    flag == EXACT or
+                    (flag == LOWER_BOUND and value >= beta) or
+                    (flag == UPPER_BOUND and value <= alpha)):
+                return value, entry_depth == SOLVED_DEPTH, False
 
-        any_unsolved = False
         moves = GoBoardUtil.generate_legal_moves(self.board, self.board.current_player)
         if depth == 0:
             random.shuffle(moves)
+            if tt_move == PASS:
+                tt_move = self.best_move
+        moves = self.move_ordering.order(self.board, moves, self.board.current_player, tt_move, depth)
 
-        for move in moves:
+        original_alpha = alpha
+        best_value = -2
+        best_move = moves[0]
+        all_solved = True
+        for i, move in enumerate(moves):
             self.board.play_move(move, self.board.current_player)
-            
-            value, solved, timeout = self.alpha_beta(-beta, -alpha, depth+1)
+            if i == 0:
+                value, solved, timeout = self.alpha_beta(-beta, -alpha, depth+1)
+                value = -value
+            else:
+                # principal variation search: prove that move is not better
+                # with a null window, and search again if it is
+                value, solved, timeout = self.alpha_beta(-alpha - NULL_WINDOW, -alpha, depth+1)
+                value = -value
+                if not timeout and alpha < value < beta:
+                    value, solved, timeout = self.alpha_beta(-beta, -alpha, depth+1)
+                    value = -value
             self.board.undo()
-            value = -value
 
             if timeout:
                 return 0, False, True
-            
-            if not solved:
-                any_unsolved = True
 
+            if value > best_value:
+                best_value = value
+                best_move = move
             if value > alpha:
                 alpha = value
                 if depth == 0:
                     self.best_move = move
 
-            if solved and value == 1:
-                return 1, True, False
+            if value >= beta:
+                self.move_ordering.record_cutoff(self.board, move, self.board.current_player,
+                                                 depth, remaining)
+                # a single solved refutation is enough
+                all_solved = solved
+                break
+            all_solved = all_solved and solved
+
+        if best_value <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_value >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(key, best_value, flag, SOLVED_DEPTH if all_solved else remaining, best_move)
+        return best_value, all_solved, False
+
+    def quiescence(self, alpha, beta, qdepth):
+        """
+        Search only forcing moves below the depth limit, until the
+        position is quiet, so that it is not evaluated in the middle of
+        a capture exchange or with a four on the board.
+        The player to move wins at once if it has a four. If the opponent
+        has a four, it must block it or capture, so only those moves are
+        searched. Otherwise the player to move may stand pat with
+        heuristic_eval, or try its captures.
+        qdepth is the number of forcing moves played so far; after
+        MAX_QUIESCENCE_DEPTH of them the position is evaluated as it is.
+        Returns (value, solved, timeout) as alpha_beta.
+        The position is not terminal when qdepth is 0.
+        """
+        if self.time_manager.out_of_time():
+            return 0, False, True
+
+        color = self.board.current_player
+        if qdepth > 0:
+            is_terminal, winner = self.board.is_terminal()
+            if is_terminal:
+                if winner == color:
+                    return 1, True, False
+                elif winner == opponent(color):
+                    return -1, True, False
+                else:
+                    return 0, True, False
+
+        patterns = self.board.patterns
+        if patterns.fours[color] > 0:
+            return 1, True, False
+        captures = patterns.capture_points(color)
+        if captures and self.board.get_captures(color) >= 8:
+            return 1, True, False
+        blocks = patterns.four_points(opponent(color))
+        stand_pat = self.board.heuristic_eval()
+        if (not blocks and not captures) or qdepth >= MAX_QUIESCENCE_DEPTH:
+            return stand_pat, False, False
+
+        if blocks:
+            # every other move loses to five in a row, so the position
+            # is solved if all of these moves are
+            moves = blocks + [move for move in captures if move not in blocks]
+            best_value = -2
+            all_solved = True
+        else:
+            if stand_pat >= beta:
+                return stand_pat, False, False
+            moves = captures
+            best_value = stand_pat
+            all_solved = False
+            alpha = max(alpha, stand_pat)
+
+        for move in moves:
+            self.board.play_move(move, color)
+            value, solved, timeout = self.quiescence(-beta, -alpha, qdepth + 1)
+            value = -value
+            self.board.undo()
+
+            if timeout:
+                return 0, False, True
 
+            if value > best_value:
+                best_value = value
+            if value > alpha:
+                alpha = value
             if value >= beta:
-                return beta, True, False
-        
-        return alpha, not any_unsolved, False
+                # a single solved refutation is enough
+                all_solved = solved
+                break
+            all_solved = all_solved and solved
+        return best_value, all_solved, False
+
+    def aspiration_search(self, guess):
+        """
+        Search the root with a window of ASPIRATION_WINDOW around guess,
+        the value of the previous iteration, and search again with the
+        full window if the value falls outside it.
+        Returns (value, solved, timeout) as alpha_beta.
+        """
+        alpha = max(-1, guess - ASPIRATION_WINDOW)
+        beta = min(1, guess + ASPIRATION_WINDOW)
+        result, solved, timeout = self.alpha_beta(alpha, beta, 0)
+        if not timeout and ((result <= alpha and alpha > -1) or (result >= beta and beta < 1)):
+            result, solved, timeout = self.alpha_beta(-1, 1, 0)
+        return result, solved, timeout
+
+    def proof_number_solve(self, board):
+        """
+        Try to solve board with proof-number search of forcing moves
+        within PN_TIME_FRACTION of the time limit: first try to prove a
+        win for the player to move, then a win for the opponent.
+        Returns (value, move) as alpha_beta does at the root,
+        or (None, None) if neither was proved.
+        """
+        deadline = self.solve_start_time + self.time_limit * PN_TIME_FRACTION
+        to_play = board.current_player
+        proved, move = self.pn_search.prove(board, to_play, (deadline - time.time()) / 2)
+        if proved:
+            return 1, move
+        proved, move = self.pn_search.prove(board, opponent(to_play), deadline - time.time())
+        if proved:
+            return -1, None
+        return None, None
 
     def solve_board(self, board):
         self.solve_start_time = time.time()
+        self.time_manager.start(self.solve_start_time, self.time_limit)
         self.board = board.copy()
-        self.tt = {}
         if self.board.get_empty_points().size == 0:
             self.best_move = PASS
         else:
             self.best_move = self.board.get_empty_points()[0]
 
+        self.move_ordering.new_search()
+        result, move = self.proof_number_solve(self.board)
+        if result is not None:
+            if move is not None:
+                self.best_move = move
+            return self.format_result(result)
+
+        if self.num_workers > 1:
+            result, solved, timeout = self.parallel_solve()
+        else:
+            result, solved, timeout = self.iterative_deepening(1)
+
+        if timeout:
+            return "unknown", None
+        return self.format_result(result)
+
+    def iterative_deepening(self, start_depth, report=None):
+        """
+        Search self.board with increasing max_depth, starting at
+        start_depth, until the result is solved or the time is up.
+        An iteration is not started if self.time_manager expects that
+        it cannot finish in time.
+        If report is given, the best move and depth of each finished
+        iteration are written to it, as a result row of parallel_solve.
+        Returns (value, solved, timeout) as alpha_beta.
+        """
         solved = False
         timeout = False
-        self.max_depth = 1
+        result = 0
+        self.max_depth = start_depth
         while not solved and not timeout:
-            result, solved, timeout = self.alpha_beta(-1, 1, 0)
+            if not self.time_manager.can_finish_iteration():
+                return result, False, True
+            self.time_manager.start_iteration()
+            result, solved, timeout = self.aspiration_search(result)
+            self.time_manager.end_iteration()
+            if report is not None and not timeout:
+                report[MOVE] = self.best_move
+                report[DEPTH] = self.max_depth
             self.max_depth += 1
-        
-        if timeout:
-            return "unknown", None
-        elif result == 1:
+        return result, solved, timeout
+
+    def parallel_solve(self):
+        """
+        Lazy SMP: run iterative deepening in self.num_workers processes
+        that share one transposition table in shared memory.
+        The workers search the same root, but with different random root
+        orders, perturbed history scores and, for every second worker,
+        a deeper first iteration, so that they fill the table for each other.
+        The first worker to solve the root gives the result.
+        If none does in time, self.best_move is the best move of the
+        deepest iteration finished by any worker, or else the best move
+        stored for the root in the shared table.
+        Returns (value, solved, timeout) as alpha_beta, and sets self.best_move.
+        """
+        size_bits = self.tt.size_bits
+        tt_size = TranspositionTable.nbytes(size_bits)
+        shm = shared_memory.SharedMemory(
+            create=True, size=tt_size + NUM_RESULTS * 8 * self.num_workers)
+        try:
+            shm.buf[:] = bytes(len(shm.buf))
+            results = np.ndarray((self.num_workers, NUM_RESULTS), dtype=np.float64,
+                                 buffer=shm.buf, offset=tt_size)
+            workers = [multiprocessing.Process(
+                target=search_worker, args=(self, shm.name, size_bits, i), daemon=True)
+                for i in range(self.num_workers)]
+            for worker in workers:
+                worker.start()
+            deadline = self.solve_start_time + self.time_limit
+            solver = None
+            while solver is None and time.time() < deadline and \
+                    any(worker.is_alive() for worker in workers):
+                time.sleep(POLL_INTERVAL)
+                for i in range(self.num_workers):
+                    if results[i][STATUS] == SOLVED:
+                        solver = i
+                        break
+            if solver is None:
+                for i in range(self.num_workers):
+                    if results[i][STATUS] == SOLVED:
+                        solver = i
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+            if solver is None:
+                deepest = int(np.argmax(results[:, DEPTH]))
+                if results[deepest][DEPTH] > 0:
+                    self.best_move = GO_POINT(results[deepest][MOVE])
+                else:
+                    tt = TranspositionTable(size_bits, shm.buf)
+                    entry = tt.lookup(self.board.zobrist_key())
+                    if entry is not None and entry[3] != PASS:
+                        self.best_move = entry[3]
+                    del tt
+                del results
+                return 0, False, True
+            value = float(results[solver][VALUE])
+            self.best_move = GO_POINT(results[solver][MOVE])
+            del results
+            return value, True, False
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def format_result(self, result):
+        """
+        Returns the (winner, move) answer of the solve command
+        for the root value result of the player to move
+        """
+        if result == 1:
             if self.board.current_player == BLACK:
                 return "b", format_point(point_to_coord(self.best_move, self.board.size)).lower()
             else:
@@ -126,6 +432,39 @@ class ABPlayer(GoEngine):
     def set_time_limit(self, time_limit):
         self.time_limit = time_limit
 
+    def set_num_workers(self, num_workers):
+        """
+        Set the number of processes used by the alpha-beta search
+        """
+        assert num_workers >= 1
+        self.num_workers = num_workers
+
+
+def search_worker(player: ABPlayer, shm_name: str, size_bits: int, worker: int) -> None:
+    """
+    Worker process of ABPlayer.parallel_solve.
+    Searches player.board with the transposition table in the shared
+    memory shm_name, and writes its result row to row number worker
+    of the results that follow the table.
+    """
+    random.seed()
+    np.random.seed()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    player.tt = TranspositionTable(size_bits, shm.buf)
+    tt_size = TranspositionTable.nbytes(size_bits)
+    results = np.ndarray((player.num_workers, NUM_RESULTS), dtype=np.float64,
+                         buffer=shm.buf, offset=tt_size)
+    if worker > 0:
+        player.move_ordering.history += np.random.random(player.move_ordering.history.shape)
+    value, solved, timeout = player.iterative_deepening(1 + worker % 2, results[worker])
+    results[worker][VALUE] = value
+    results[worker][MOVE] = player.best_move
+    results[worker][STATUS] = SOLVED if solved else STOPPED
+    del results
+    player.tt = None
+    shm.close()
+
+
 def run() -> None:
     """
     start the gtp connection and wait for commands.
@@ -31,6 +31,28 @@ from board_base import (
     GO_COLOR,
     GO_POINT,
 )
+from pattern_eval import PatternEval
+
+"""
+Random 64-bit keys for Zobrist hashing of positions, indexed by [color][point],
+keys for the player to move and the capture counts, indexed by
+[current player][black captures][white captures], captures capped at 10,
+and keys for the board size, since the empty board hashes to 0 at every size.
+"""
+ZOBRIST_SEED: int = 455
+ZOBRIST_KEYS: List[List[int]] = np.random.default_rng(ZOBRIST_SEED).integers(
+    1, 2**63, size=(3, board_array_size(MAXSIZE)), dtype=np.int64).tolist()
+STATE_KEYS: List[List[List[int]]] = np.random.default_rng(ZOBRIST_SEED + 1).integers(
+    1, 2**63, size=(3, 11, 11), dtype=np.int64).tolist()
+SIZE_KEYS: List[int] = np.random.default_rng(ZOBRIST_SEED + 2).integers(
+    1, 2**63, size=MAXSIZE + 1, dtype=np.int64).tolist()
+
+"""
+heuristic_eval: value of one captured stone in the units of PatternEval,
+and the scale that maps scores into (-1, 1), strictly between a loss and a win
+"""
+CAPTURE_VALUE: int = 3
+EVAL_SCALE: int = 100
 
 
 """
@@ -87,6 +109,8 @@ class GoBoard(object):
         self.black_capture_history = []
         self.white_capture_history = []
         self.move_history = []
+        self.hash: int = 0
+        self.patterns: PatternEval = PatternEval(size)
 
     def copy(self) -> 'GoBoard':
         b = GoBoard(self.size)
@@ -103,6 +127,8 @@ class GoBoard(object):
         b.black_capture_history = self.black_capture_history.copy()
         b.white_capture_history = self.white_capture_history.copy()
         b.move_history = self.move_history.copy()
+        b.hash = self.hash
+        b.patterns = self.patterns.copy()
         return b
 
     def get_color(self, point: GO_POINT) -> GO_COLOR:
@@ -158,6 +184,8 @@ class GoBoard(object):
         if self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self.hash ^= ZOBRIST_KEYS[color][point]
+        self.patterns.update(point, EMPTY, color)
         self.current_player = opponent(color)
         self.last2_move = self.last_move
         self.last_move = point
@@ -169,6 +197,9 @@ class GoBoard(object):
             if self.board[point+offset] == O and self.board[point+(offset*2)] == O and self.board[point+(offset*3)] == color:
                 self.board[point+offset] = EMPTY
                 self.board[point+(offset*2)] = EMPTY
+                self.hash ^= ZOBRIST_KEYS[O][point+offset] ^ ZOBRIST_KEYS[O][point+(offset*2)]
+                self.patterns.update(point+offset, O, EMPTY)
+                self.patterns.update(point+(offset*2), O, EMPTY)
                 if color == BLACK:
                     self.black_captures += 2
                     bcs.append(point+offset)
@@ -184,16 +215,23 @@ class GoBoard(object):
         return True
     
     def undo(self):
-        self.board[self.move_history.pop()] = EMPTY
+        point = self.move_history.pop()
+        self.hash ^= ZOBRIST_KEYS[self.board[point]][point]
+        self.patterns.update(point, self.board[point], EMPTY)
+        self.board[point] = EMPTY
         self.current_player = opponent(self.current_player)
         self.depth -= 1
         bcs = self.black_capture_history.pop()
         for point in bcs:
             self.board[point] = WHITE
+            self.hash ^= ZOBRIST_KEYS[WHITE][point]
+            self.patterns.update(point, EMPTY, WHITE)
             self.black_captures -= 1
         wcs = self.white_capture_history.pop()
         for point in wcs:
             self.board[point] = BLACK
+            self.hash ^= ZOBRIST_KEYS[BLACK][point]
+            self.patterns.update(point, EMPTY, BLACK)
             self.white_captures -= 1
         if len(self.move_history) > 0:
             self.last_move = self.move_history[-1]
@@ -274,13 +312,23 @@ class GoBoard(object):
 
     def heuristic_eval(self):
         """
-        Returns: a very basic heuristic value of the board
-        Currently only considers captures
+        Returns: a heuristic value of the board for the player to move,
+        strictly between -1 (loss) and 1 (win), in steps of 1 / EVAL_SCALE.
+        It counts the lines of stones and capture threats of self.patterns
+        and CAPTURE_VALUE per captured stone.
         """
-        if self.current_player == BLACK:
-            return (self.black_captures - self.white_captures) / 10
-        else:
-            return (self.white_captures - self.black_captures) / 10
+        score = self.patterns.score + CAPTURE_VALUE * (self.black_captures - self.white_captures)
+        if self.current_player == WHITE:
+            score = -score
+        return max(1 - EVAL_SCALE, min(EVAL_SCALE - 1, score)) / EVAL_SCALE
+
+    def zobrist_key(self) -> int:
+        """
+        64-bit key of the position: the board size, the stones,
+        the player to move and the capture counts
+        """
+        return self.hash ^ SIZE_KEYS[self.size] ^ STATE_KEYS[self.current_player][
+            min(self.black_captures, 10)][min(self.white_captures, 10)]
 
     def state_to_str(self):
         state = np.array2string(self.board, separator='')
@@ -73,7 +73,8 @@ class GtpConnection:
             "gogui-rules_board": self.gogui_rules_board_cmd,
             "gogui-analyze_commands": self.gogui_analyze_cmd,
             "timelimit": self.timelimit_cmd,
-            "solve": self.solve_cmd
+            "solve": self.solve_cmd,
+            "workers": self.workers_cmd
         }
 
         # argmap is used for argument checking
@@ -86,6 +87,7 @@ class GtpConnection:
             "genmove": (1, "Usage: genmove {w,b}"),
             "play": (2, "Usage: play {b,w} MOVE"),
             "legal_moves": (1, "Usage: legal_moves {w,b}"),
+            "workers": (1, "Usage: workers INT"),
         }
 
     def write(self, data: str) -> None:
@@ -376,6 +378,18 @@ class GtpConnection:
         else:
             self.respond(winner + " " + winning_move)
 
+    def workers_cmd(self, args: List[str]) -> None:
+        """ Set the number of processes used by the search """
+        try:
+            num_workers = int(args[0])
+        except ValueError:
+            num_workers = 0
+        if num_workers < 1:
+            self.error("Usage: workers INT")
+            return
+        self.engine.set_num_workers(num_workers)
+        self.respond()
+
 def point_to_coord(point: GO_POINT, boardsize: int) -> Tuple[int, int]:
     """
     Transform point given as board array index 
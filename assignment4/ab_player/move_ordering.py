@@ -0,0 +1,134 @@
+"""
+move_ordering.py
+Move ordering for the alpha-beta search.
+
+Moves are searched in this order: the best move stored for the
+position (the principal variation of the previous iteration), then
+tactical moves, then quiet moves.
+Tactical moves are classified by looking only at the lines through
+the move and at its capture patterns, so ordering costs a few array
+reads per move.
+Quiet moves are ordered by the killer heuristic (quiet moves that
+caused a beta cutoff at the same ply) and then by the history
+heuristic (how much each point has caused cutoffs for that color).
+"""
+
+import numpy as np
+from typing import List
+
+from board_base import GO_COLOR, GO_POINT, MAXSIZE, PASS, board_array_size, opponent
+from board import GoBoard
+
+WIN = 5         # completes five in a row, or a capture that reaches 10
+BLOCK_WIN = 4   # the opponent would complete five in a row here
+CAPTURE = 3     # captures a pair
+OPEN_FOUR = 2   # makes four in a row
+BLOCK_FOUR = 1  # the opponent would make four in a row here
+QUIET = 0
+
+MAX_PLY: int = MAXSIZE * MAXSIZE
+NUM_KILLERS: int = 2
+
+
+class MoveOrdering(object):
+    def __init__(self) -> None:
+        # killer moves per ply, most recent first
+        self.killers: np.ndarray = np.full((MAX_PLY, NUM_KILLERS), PASS, dtype=np.int32)
+        # history scores indexed by [color][point]
+        self.history: np.ndarray = np.zeros((3, board_array_size(MAXSIZE)), dtype=np.float64)
+
+    def new_search(self) -> None:
+        """
+        Forget the killers of the previous search and age its history scores
+        """
+        self.killers[:] = PASS
+        self.history *= 0.5
+
+    def order(self, board: GoBoard, moves: List[GO_POINT], color: GO_COLOR,
+              first: GO_POINT = PASS, ply: int = 0) -> List[GO_POINT]:
+        """
+        Returns moves for color sorted for the search: first, if it is
+        in moves, then the others by decreasing tactical class.
+        Within a class, the killers of ply come first, then the moves
+        with the higher history score.
+        The sort is stable, so otherwise equal moves keep their order.
+        """
+        cells = board.board.tolist()
+        NS = board.NS
+        captures = board.get_captures(color)
+        killers = self.killers[ply].tolist() if ply < MAX_PLY else []
+        history = self.history[color]
+
+        def sort_key(move: GO_POINT):
+            killer_rank = killers.index(move) if move in killers else NUM_KILLERS
+            return (-tactical_class(cells, NS, move, color, captures),
+                    killer_rank, -history[move])
+
+        ordered = sorted((move for move in moves if move != first), key=sort_key)
+        if first != PASS and first in moves:
+            ordered.insert(0, first)
+        return ordered
+
+    def record_cutoff(self, board: GoBoard, move: GO_POINT, color: GO_COLOR,
+                      ply: int, remaining: int) -> None:
+        """
+        Record that move for color caused a beta cutoff at ply, with
+        remaining plies searched below it. Only quiet moves become killers
+        and gain history; tactical moves are ordered first anyway.
+        """
+        cells = board.board.tolist()
+        if tactical_class(cells, board.NS, move, color, board.get_captures(color)) != QUIET:
+            return
+        self.history[color][move] += remaining * remaining
+        if ply < MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+
+
+def run_length(cells: List[int], point: GO_POINT, step: int, color: GO_COLOR) -> int:
+    """
+    Length of the line of color through point in direction step,
+    if color played on point
+    """
+    length = 1
+    p = point + step
+    while cells[p] == color:
+        length += 1
+        p += step
+    p = point - step
+    while cells[p] == color:
+        length += 1
+        p -= step
+    return length
+
+
+def tactical_class(cells: List[int], NS: int, point: GO_POINT,
+                   color: GO_COLOR, captures: int) -> int:
+    """
+    The highest tactical class of playing color on the empty point.
+    cells is the board as a list and captures the number of stones
+    color has captured.
+    """
+    O = opponent(color)
+    best = QUIET
+    for step in (1, NS, NS + 1, NS - 1):
+        own = run_length(cells, point, step, color)
+        if own >= 5:
+            return WIN
+        other = run_length(cells, point, step, O)
+        if other >= 5:
+            best = max(best, BLOCK_WIN)
+        elif own == 4:
+            best = max(best, OPEN_FOUR)
+        elif other == 4:
+            best = max(best, BLOCK_FOUR)
+    if best >= CAPTURE:
+        return best
+    captured = 0
+    for offset in (1, -1, NS, -NS, NS + 1, -(NS + 1), NS - 1, -NS + 1):
+        if cells[point + offset] == O and cells[point + 2 * offset] == O \
+                and cells[point + 3 * offset] == color:
+            captured += 2
+    if captured > 0:
+        return WIN if captures + captured >= 10 else CAPTURE
+    return best
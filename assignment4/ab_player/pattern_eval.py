@@ -0,0 +1,242 @@
+"""
+pattern_eval.py
+Incremental pattern evaluation for the alpha-beta search.
+
+The board is covered by windows: every 5 points in a row, column or
+diagonal, and every 4 points in a line. Each window has a code, its
+colors as a base 4 number, and a value read from a table indexed by
+the code:
+- a 5-point window with stones of only one color is worth
+  WINDOW_VALUES[number of stones] to that color. An open three or four
+  lies in more such windows than a closed one, so it is worth more.
+- a 4-point window X O O . (or . O O X) is a capture threat of X,
+  worth CAPTURE_THREAT_VALUE to X.
+When a point changes color, only the windows through it are updated,
+so the total stays current at the cost of a few list operations.
+The number of fours (5-point windows with 4 stones of one color and an
+empty point) and of capture threats of each color are kept the same
+way, so that the search can tell quiet positions at once.
+The empty points where a color makes a four or a capture threat are
+read from the window codes as well, for searches of forcing moves.
+"""
+
+from typing import Dict, List, Tuple
+
+from board_base import BLACK, WHITE, EMPTY, GO_COLOR, GO_POINT, board_array_size
+
+WINDOW_VALUES: Tuple[int, ...] = (0, 0, 1, 4, 12, 0)
+CAPTURE_THREAT_VALUE: int = 3
+
+_WINDOWS: Dict[Tuple[int, int], Tuple[List[List[GO_POINT]], List[List[Tuple[int, int]]]]] = {}
+
+
+def window_table(length: int) -> List[int]:
+    """
+    Value for BLACK minus value for WHITE of every code of a window of length points
+    """
+    table = []
+    for code in range(4 ** length):
+        colors = [(code >> (2 * i)) & 3 for i in range(length)]
+        value = 0
+        if length == 5:
+            for color, sign in ((BLACK, 1), (WHITE, -1)):
+                if all(c == color or c == EMPTY for c in colors):
+                    value += sign * WINDOW_VALUES[colors.count(color)]
+        else:
+            for color, sign in ((BLACK, 1), (WHITE, -1)):
+                O = WHITE + BLACK - color
+                if colors[1] == O and colors[2] == O and (
+                        (colors[0] == color and colors[3] == EMPTY) or
+                        (colors[0] == EMPTY and colors[3] == color)):
+                    value += sign * CAPTURE_THREAT_VALUE
+        table.append(value)
+    return table
+
+
+def threat_table(length: int, color: GO_COLOR) -> List[int]:
+    """
+    For every code of a window of length points, the position of its
+    threat point for color, or -1: the empty point of a four if
+    length is 5, the empty end of a capture threat if length is 4
+    """
+    table = []
+    O = WHITE + BLACK - color
+    for code in range(4 ** length):
+        colors = [(code >> (2 * i)) & 3 for i in range(length)]
+        position = -1
+        if length == 5:
+            if colors.count(color) == 4 and colors.count(EMPTY) == 1:
+                position = colors.index(EMPTY)
+        elif colors[1] == O and colors[2] == O:
+            if colors[0] == color and colors[3] == EMPTY:
+                position = 3
+            elif colors[0] == EMPTY and colors[3] == color:
+                position = 0
+        table.append(position)
+    return table
+
+
+def forcing_table(length: int, color: GO_COLOR) -> List[Tuple[int, ...]]:
+    """
+    For every code of a window of length points, the positions where
+    color makes a threat: the empty points of 3 stones of color and 2
+    empty points if length is 5, the ends of . O O . if length is 4
+    """
+    table = []
+    O = WHITE + BLACK - color
+    for code in range(4 ** length):
+        colors = [(code >> (2 * i)) & 3 for i in range(length)]
+        positions: Tuple[int, ...] = ()
+        if length == 5:
+            if colors.count(color) == 3 and colors.count(EMPTY) == 2:
+                positions = tuple(i for i in range(length) if colors[i] == EMPTY)
+        elif colors == [EMPTY, O, O, EMPTY]:
+            positions = (0, 3)
+        table.append(positions)
+    return table
+
+
+TABLES: Dict[int, List[int]] = {5: window_table(5), 4: window_table(4)}
+THREATS: Dict[int, List[List[int]]] = {
+    length: [[], threat_table(length, BLACK), threat_table(length, WHITE)]
+    for length in (5, 4)}
+FORCING: Dict[int, List[List[Tuple[int, ...]]]] = {
+    length: [[], forcing_table(length, BLACK), forcing_table(length, WHITE)]
+    for length in (5, 4)}
+
+
+def point_windows(size: int, length: int) -> Tuple[List[List[GO_POINT]], List[List[Tuple[int, int]]]]:
+    """
+    Returns the points of every window of length points on a board of
+    the given size, and for each point of the padded 1D board the windows
+    through it as (window index, 4 ** position of the point in the window).
+    Computed once per size.
+    """
+    if (size, length) not in _WINDOWS:
+        NS = size + 1
+        result: List[List[Tuple[int, int]]] = [[] for _ in range(board_array_size(size))]
+        windows: List[List[GO_POINT]] = []
+        for row in range(1, size + 1):
+            for col in range(1, size + 1):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row = row + dr * (length - 1)
+                    end_col = col + dc * (length - 1)
+                    if not (1 <= end_row <= size and 1 <= end_col <= size):
+                        continue
+                    points = [NS * (row + dr * i) + col + dc * i for i in range(length)]
+                    for i, point in enumerate(points):
+                        result[point].append((len(windows), 4 ** i))
+                    windows.append(points)
+        _WINDOWS[(size, length)] = (windows, result)
+    return _WINDOWS[(size, length)]
+
+
+class PatternEval(object):
+    def __init__(self, size: int) -> None:
+        """
+        Evaluation of an empty board of the given size
+        """
+        self.points5, self.windows5 = point_windows(size, 5)
+        self.points4, self.windows4 = point_windows(size, 4)
+        self.codes5: List[int] = [0] * len(self.points5)
+        self.codes4: List[int] = [0] * len(self.points4)
+        # value for BLACK minus value for WHITE
+        self.score: int = 0
+        # number of fours and of capture threats, indexed by color
+        self.fours: List[int] = [0, 0, 0]
+        self.capture_threats: List[int] = [0, 0, 0]
+
+    def copy(self) -> 'PatternEval':
+        patterns = PatternEval.__new__(PatternEval)
+        patterns.points5 = self.points5
+        patterns.windows5 = self.windows5
+        patterns.points4 = self.points4
+        patterns.windows4 = self.windows4
+        patterns.codes5 = self.codes5.copy()
+        patterns.codes4 = self.codes4.copy()
+        patterns.score = self.score
+        patterns.fours = self.fours.copy()
+        patterns.capture_threats = self.capture_threats.copy()
+        return patterns
+
+    def update(self, point: GO_POINT, old: GO_COLOR, new: GO_COLOR) -> None:
+        """
+        Update the windows through point, which changed from old to new
+        """
+        diff = int(new) - int(old)
+        score = self.score
+        table = TABLES[5]
+        black, white = THREATS[5][BLACK], THREATS[5][WHITE]
+        counts = self.fours
+        codes = self.codes5
+        for window, power in self.windows5[point]:
+            code = codes[window]
+            score -= table[code]
+            counts[BLACK] -= black[code] >= 0
+            counts[WHITE] -= white[code] >= 0
+            code += diff * power
+            codes[window] = code
+            score += table[code]
+            counts[BLACK] += black[code] >= 0
+            counts[WHITE] += white[code] >= 0
+        table = TABLES[4]
+        black, white = THREATS[4][BLACK], THREATS[4][WHITE]
+        counts = self.capture_threats
+        codes = self.codes4
+        for window, power in self.windows4[point]:
+            code = codes[window]
+            score -= table[code]
+            counts[BLACK] -= black[code] >= 0
+            counts[WHITE] -= white[code] >= 0
+            code += diff * power
+            codes[window] = code
+            score += table[code]
+            counts[BLACK] += black[code] >= 0
+            counts[WHITE] += white[code] >= 0
+        self.score = score
+
+    def four_points(self, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        The empty points where color completes five in a row
+        """
+        if self.fours[color] == 0:
+            return []
+        return self._threat_points(THREATS[5][color], self.codes5, self.points5)
+
+    def capture_points(self, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        The empty points where color captures a pair
+        """
+        if self.capture_threats[color] == 0:
+            return []
+        return self._threat_points(THREATS[4][color], self.codes4, self.points4)
+
+    def three_points(self, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        The empty points where color makes a four
+        """
+        return self._forcing_points(FORCING[5][color], self.codes5, self.points5)
+
+    def pair_points(self, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        The empty points where color threatens to capture a pair
+        """
+        return self._forcing_points(FORCING[4][color], self.codes4, self.points4)
+
+    def _forcing_points(self, forcing: List[Tuple[int, ...]], codes: List[int],
+                        points: List[List[GO_POINT]]) -> List[GO_POINT]:
+        result = []
+        for window, code in enumerate(codes):
+            for position in forcing[code]:
+                if points[window][position] not in result:
+                    result.append(points[window][position])
+        return result
+
+    def _threat_points(self, threats: List[int], codes: List[int],
+                       points: List[List[GO_POINT]]) -> List[GO_POINT]:
+        result = []
+        for window, code in enumerate(codes):
+            position = threats[code]
+            if position >= 0 and points[window][position] not in result:
+                result.append(points[window][position])
+        return result
@@ -0,0 +1,258 @@
+"""
+pn_search.py
+Depth-first proof-number search (df-pn) of forcing moves in Ninuki.
+
+The search tries to prove that the attacker wins with threats only:
+- the attacker plays moves that make a four, capture, or, with 8
+  captures, threaten a capture;
+- after an attacker move, the defender must face an immediate win.
+  Its only moves are then the threat points and its own captures,
+  since any other move loses at once. If there is no threat, the
+  attacker has failed on this line.
+A proof is a proof of a win. A failure to prove says nothing about
+the game: the attacker may still win with quiet moves.
+
+Proof and disproof numbers steer the search towards the narrowest
+part of the tree. The search works on one board with play_move and
+undo, and positions are found again through board.zobrist_key(), with
+the fours and capture threats read from board.patterns. Proof and
+disproof numbers are stored in a table of bounded size: when it is
+full, the entries with the least search effort are dropped.
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+from board_base import EMPTY, GO_COLOR, GO_POINT, opponent
+from board import GoBoard
+
+INFINITY: int = 10**9
+DEFAULT_NODE_LIMIT: int = 10000
+DEFAULT_TABLE_SIZE: int = 500000
+"""
+Number of expanded nodes between two checks of the clock
+"""
+TIME_CHECK_INTERVAL: int = 64
+
+
+class PNSearchLimit(Exception):
+    """ Raised inside the search when the node or time limit is reached """
+    pass
+
+
+class PNSearch(object):
+    def __init__(self, node_limit: int = DEFAULT_NODE_LIMIT,
+                 table_size: int = DEFAULT_TABLE_SIZE) -> None:
+        """
+        Proof-number search expanding at most node_limit nodes per proof,
+        with a table of at most table_size entries
+        """
+        self.node_limit: int = node_limit
+        self.table_size: int = table_size
+        self.nodes: int = 0
+        # key -> [proof number, disproof number, nodes spent on the entry]
+        self.table: Dict[int, List[int]] = {}
+        self._attacker: GO_COLOR = EMPTY
+        self._deadline: float = 0.0
+
+    def prove(self, board: GoBoard, attacker: GO_COLOR,
+              time_limit: float) -> Tuple[bool, Optional[GO_POINT]]:
+        """
+        Try to prove that attacker wins on board with forcing moves.
+        Returns (True, move) if attacker wins, where move is the winning
+        move if attacker is to move and None otherwise, and (False, None)
+        if no proof was found within the limits.
+        """
+        self.nodes = 0
+        self.table = {}
+        self._attacker = attacker
+        self._deadline = time.time() + time_limit
+        board = board.copy()
+        if board.is_terminal()[0]:
+            return False, None
+        numbers = self._evaluate(board)
+        if numbers is None:
+            try:
+                self.mid(board, INFINITY, INFINITY)
+            except PNSearchLimit:
+                return False, None
+            numbers = self._lookup(board)
+        if numbers[0] != 0:
+            return False, None
+        return True, self._solving_move(board)
+
+    def _is_or_node(self, board: GoBoard) -> bool:
+        return board.current_player == self._attacker
+
+    def _lookup(self, board: GoBoard) -> Tuple[int, int]:
+        entry = self.table.get(board.zobrist_key())
+        if entry is None:
+            return 1, 1
+        return entry[0], entry[1]
+
+    def _store(self, board: GoBoard, pn: int, dn: int, work: int) -> None:
+        if len(self.table) >= self.table_size:
+            self._collect_garbage()
+        self.table[board.zobrist_key()] = [pn, dn, work]
+
+    def _collect_garbage(self) -> None:
+        """
+        Keep all solved entries and the half of the others
+        with the most search effort
+        """
+        unsolved = [(entry[2], key) for key, entry in self.table.items()
+                    if entry[0] != 0 and entry[1] != 0]
+        unsolved.sort(key=lambda item: item[0])
+        for _, key in unsolved[:len(unsolved) // 2 + 1]:
+            del self.table[key]
+
+    def _immediate_wins(self, board: GoBoard, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        The moves that win at once for color:
+        completing five in a row, or a capture that reaches 10
+        """
+        patterns = board.patterns
+        wins = patterns.four_points(color)
+        if board.get_captures(color) >= 8:
+            wins += [move for move in patterns.capture_points(color) if move not in wins]
+        return wins
+
+    def _evaluate(self, board: GoBoard) -> Optional[Tuple[int, int]]:
+        """
+        Proof and disproof numbers of a decided position, or None.
+        The position is decided if a player has 10 captures, if the
+        player to move wins at once, or if the defender is to move and
+        the attacker has no immediate win to threaten.
+        A five on the board is not checked for: a move that makes it is
+        an immediate win, and positions with one are not searched.
+        """
+        color = board.current_player
+        previous = opponent(color)
+        if board.get_captures(previous) >= 10:
+            winner = previous
+        elif len(self._immediate_wins(board, color)) > 0:
+            winner = color
+        elif color != self._attacker and len(self._immediate_wins(board, previous)) == 0:
+            winner = color
+        else:
+            return None
+        if winner == self._attacker:
+            return 0, INFINITY
+        return INFINITY, 0
+
+    def _moves(self, board: GoBoard) -> List[GO_POINT]:
+        """
+        The forcing moves of the attacker, or the defences against the
+        immediate wins of the attacker
+        """
+        patterns = board.patterns
+        attacker = self._attacker
+        if self._is_or_node(board):
+            moves = patterns.three_points(attacker) + patterns.capture_points(attacker)
+            if board.get_captures(attacker) >= 8:
+                moves += patterns.pair_points(attacker)
+        else:
+            moves = self._immediate_wins(board, attacker) + \
+                patterns.capture_points(opponent(attacker))
+        return list(dict.fromkeys(moves))
+
+    def _children(self, board: GoBoard) -> List[Tuple[GO_POINT, int, Optional[Tuple[int, int]]]]:
+        """
+        The moves of the player to move, each with the table key of the
+        position after it and its proof and disproof numbers if it is decided
+        """
+        children = []
+        color = board.current_player
+        for move in self._moves(board):
+            board.play_move(move, color)
+            children.append((move, board.zobrist_key(), self._evaluate(board)))
+            board.undo()
+        return children
+
+    def _child_numbers(self, key: int, terminal: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+        if terminal is not None:
+            return terminal
+        entry = self.table.get(key)
+        if entry is None:
+            return 1, 1
+        return entry[0], entry[1]
+
+    def _select(self, children: List[Tuple[GO_POINT, int, Optional[Tuple[int, int]]]],
+                is_or: bool) -> Tuple[int, int, GO_POINT, int, int, int]:
+        """
+        Returns the proof and disproof numbers of the node, the most
+        proving child, its numbers, and the second smallest number
+        used to set the child threshold
+        """
+        pn = INFINITY if is_or else 0
+        dn = 0 if is_or else INFINITY
+        best_move, best_pn, best_dn = children[0][0], INFINITY, INFINITY
+        second = INFINITY
+        for move, key, terminal in children:
+            child_pn, child_dn = self._child_numbers(key, terminal)
+            if is_or:
+                dn = min(INFINITY, dn + child_dn)
+                if child_pn < best_pn:
+                    second = best_pn
+                    best_move, best_pn, best_dn = move, child_pn, child_dn
+                elif child_pn < second:
+                    second = child_pn
+            else:
+                pn = min(INFINITY, pn + child_pn)
+                if child_dn < best_dn:
+                    second = best_dn
+                    best_move, best_pn, best_dn = move, child_pn, child_dn
+                elif child_dn < second:
+                    second = child_dn
+        if is_or:
+            pn = best_pn
+        else:
+            dn = best_dn
+        return pn, dn, best_move, best_pn, best_dn, second
+
+    def mid(self, board: GoBoard, pn_threshold: int, dn_threshold: int) -> None:
+        """
+        Expand board until its proof number reaches pn_threshold
+        or its disproof number reaches dn_threshold.
+        The position is not decided.
+        """
+        self.nodes += 1
+        if self.nodes >= self.node_limit or \
+                (self.nodes % TIME_CHECK_INTERVAL == 0 and time.time() > self._deadline):
+            raise PNSearchLimit()
+        start_nodes = self.nodes
+        is_or = self._is_or_node(board)
+        children = self._children(board)
+        if len(children) == 0:
+            # no forcing move left: the attacker fails here
+            self._store(board, INFINITY, 0, 1)
+            return
+        while True:
+            pn, dn, move, child_pn, child_dn, second = self._select(children, is_or)
+            if pn >= pn_threshold or dn >= dn_threshold:
+                break
+            if is_or:
+                child_pn_threshold = min(pn_threshold, second + 1)
+                child_dn_threshold = min(INFINITY, dn_threshold - dn + child_dn)
+            else:
+                child_pn_threshold = min(INFINITY, pn_threshold - pn + child_pn)
+                child_dn_threshold = min(dn_threshold, second + 1)
+            board.play_move(move, board.current_player)
+            self.mid(board, child_pn_threshold, child_dn_threshold)
+            board.undo()
+        self._store(board, pn, dn, self.nodes - start_nodes + 1)
+
+    def _solving_move(self, board: GoBoard) -> Optional[GO_POINT]:
+        """
+        The winning move of the attacker on a proved board,
+        or None if the defender is to move
+        """
+        if not self._is_or_node(board):
+            return None
+        wins = self._immediate_wins(board, self._attacker)
+        if len(wins) > 0:
+            return wins[0]
+        for move, key, terminal in self._children(board):
+            if self._child_numbers(key, terminal)[0] == 0:
+                return move
+        return None
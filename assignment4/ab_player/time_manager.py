@@ -0,0 +1,101 @@
+"""
+time_manager.py
+Time control for the iterative deepening alpha-beta search.
+
+The search counts its nodes and reads the clock only every
+TIME_CHECK_INTERVAL nodes, since a clock call costs about as much as a
+node of the search. The search stops at a check if the next check,
+at the node rate measured since the previous one, would come after
+the deadline.
+Before each iteration of iterative deepening, the time manager
+predicts its duration from the previous one and from the effective
+branching factor, the ratio of the node counts of the last two
+iterations. An iteration that cannot finish before the deadline is not
+started, as its partial result would be thrown away.
+"""
+
+import time
+from typing import List, Optional
+
+"""
+Number of nodes between two checks of the clock
+"""
+TIME_CHECK_INTERVAL: int = 256
+"""
+Seconds kept in reserve before the time limit
+"""
+SAFETY_MARGIN: float = 0.01
+
+
+class TimeManager(object):
+    def __init__(self, check_interval: int = TIME_CHECK_INTERVAL) -> None:
+        self.check_interval: int = check_interval
+        self.start_time: float = 0.0
+        self.deadline: float = 0.0
+        self.nodes: int = 0
+        self._last_check_time: float = 0.0
+        self._last_check_nodes: int = 0
+        # node count and duration of each finished iteration
+        self.iteration_nodes: List[int] = []
+        self.iteration_times: List[float] = []
+        self._iteration_start_nodes: int = 0
+        self._iteration_start_time: float = 0.0
+
+    def start(self, start_time: float, time_limit: float) -> None:
+        """
+        Start a search at start_time that must stop within time_limit seconds
+        """
+        self.start_time = start_time
+        self.deadline = start_time + time_limit - SAFETY_MARGIN
+        self.nodes = 0
+        self._last_check_time = start_time
+        self._last_check_nodes = 0
+        self.iteration_nodes = []
+        self.iteration_times = []
+
+    def out_of_time(self) -> bool:
+        """
+        Count a node of the search. Every check_interval nodes,
+        tell whether the deadline would pass before the next check.
+        """
+        self.nodes += 1
+        if self.nodes % self.check_interval != 0:
+            return False
+        now = time.time()
+        time_per_node = (now - self._last_check_time) / (self.nodes - self._last_check_nodes)
+        self._last_check_time = now
+        self._last_check_nodes = self.nodes
+        return now + time_per_node * self.check_interval > self.deadline
+
+    def start_iteration(self) -> None:
+        self._iteration_start_nodes = self.nodes
+        self._iteration_start_time = time.time()
+        # the time before the first iteration is not search time
+        if self._last_check_nodes == 0:
+            self._last_check_time = self._iteration_start_time
+
+    def end_iteration(self) -> None:
+        self.iteration_nodes.append(self.nodes - self._iteration_start_nodes)
+        self.iteration_times.append(time.time() - self._iteration_start_time)
+
+    def branching_factor(self) -> Optional[float]:
+        """
+        Effective branching factor of the last two iterations,
+        or None before two iterations with nodes have finished
+        """
+        if len(self.iteration_nodes) < 2 or self.iteration_nodes[-2] == 0:
+            return None
+        return max(1.0, self.iteration_nodes[-1] / self.iteration_nodes[-2])
+
+    def can_finish_iteration(self) -> bool:
+        """
+        Tell whether the next iteration is expected to finish before
+        the deadline. The first two iterations are always started.
+        """
+        now = time.time()
+        if now > self.deadline:
+            return False
+        branching_factor = self.branching_factor()
+        if branching_factor is None:
+            return True
+        return now + self.iteration_times[-1] * branching_factor <= self.deadline
@@ -0,0 +1,108 @@
+"""
+transposition_table.py
+Fixed-size transposition table for the alpha-beta search.
+
+Entries are stored in numpy arrays with 2**size_bits slots, indexed by
+the low bits of the 64-bit Zobrist key of the position. When two
+positions share a slot, the entry searched to the greater depth is kept
+(depth-preferred replacement).
+
+Each entry is two 64-bit words: the data (value, bound flag, depth and
+best move packed together) and a check word, the key XOR the data.
+A lookup only accepts an entry if the check word matches its key and data.
+This lets several processes share one table in a
+multiprocessing.shared_memory block without locks: an entry that is
+half written by another process fails the check and counts as a miss.
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+from board_base import GO_POINT, PASS
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+"""
+Depth stored for values that are proven, and so hold at any depth
+"""
+SOLVED_DEPTH: int = 1000
+DEFAULT_SIZE_BITS: int = 20
+
+"""
+Values are stored as integers in units of 1 / VALUE_SCALE
+"""
+VALUE_SCALE: int = 10000
+VALUE_OFFSET: int = 1 << 31
+MASK_64: int = (1 << 64) - 1
+
+
+def pack(value: float, flag: int, depth: int, move: GO_POINT) -> int:
+    """
+    Pack an entry into 64 bits: value in bits 0-31, flag in bits 32-33,
+    depth + 1 in bits 34-45 (so that 0 marks an empty slot)
+    and move + 2 in bits 46-61 (so that PASS is not negative)
+    """
+    return ((int(round(value * VALUE_SCALE)) + VALUE_OFFSET)
+            | (flag << 32) | ((depth + 1) << 34) | ((int(move) + 2) << 46))
+
+
+def unpack(data: int) -> Tuple[float, int, int, GO_POINT]:
+    return (((data & 0xFFFFFFFF) - VALUE_OFFSET) / VALUE_SCALE,
+            (data >> 32) & 0x3,
+            ((data >> 34) & 0xFFF) - 1,
+            GO_POINT(((data >> 46) & 0xFFFF) - 2))
+
+
+class TranspositionTable(object):
+    def __init__(self, size_bits: int = DEFAULT_SIZE_BITS,
+                 buffer: Optional[memoryview] = None) -> None:
+        """
+        Creates a table with 2**size_bits slots.
+        Without a buffer the table is empty. With a buffer, the table is
+        a view into its first TranspositionTable.nbytes(size_bits) bytes.
+        """
+        self.size_bits: int = size_bits
+        self.size: int = 1 << size_bits
+        self.mask: int = self.size - 1
+        if buffer is None:
+            words = np.zeros((2, self.size), dtype=np.uint64)
+        else:
+            words = np.ndarray((2, self.size), dtype=np.uint64, buffer=buffer)
+        self.checks: np.ndarray = words[0]
+        self.data: np.ndarray = words[1]
+
+    @staticmethod
+    def nbytes(size_bits: int) -> int:
+        """
+        Size of the buffer used by a table with 2**size_bits slots
+        """
+        return 2 * (1 << size_bits) * np.dtype(np.uint64).itemsize
+
+    def lookup(self, key: int) -> Optional[Tuple[float, int, int, GO_POINT]]:
+        """
+        Returns (value, flag, depth, best move) stored for key, or None
+        """
+        slot = key & self.mask
+        data = int(self.data[slot])
+        if data == 0 or int(self.checks[slot]) ^ data != key:
+            return None
+        return unpack(data)
+
+    def store(self, key: int, value: float, flag: int, depth: int, move: GO_POINT) -> None:
+        """
+        Store a search result for key, unless its slot holds another
+        position searched deeper
+        """
+        slot = key & self.mask
+        old = int(self.data[slot])
+        if old != 0 and int(self.checks[slot]) ^ old != key and unpack(old)[2] > depth:
+            return
+        data = pack(value, flag, depth, move)
+        self.data[slot] = data
+        self.checks[slot] = (key ^ data) & MASK_64
+
+    def clear(self) -> None:
+        self.checks[:] = 0
+        self.data[:] = 0
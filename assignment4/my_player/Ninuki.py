@@ -6,22 +6,74 @@ Go0 random Go player
 Cmput 455 sample code
 Written by Cmput 455 TA and Martin Mueller
 """
-from typing import Tuple, List, Union, Any
+from typing import Tuple, List, Dict, Union, Any, Optional
 
+import numpy as np
 from numpy import signedinteger, intc
 from numpy._typing import _32Bit
 
 from gtp_connection import GtpConnection
-from board_base import DEFAULT_SIZE, GO_POINT, GO_COLOR, PASS
+from board_base import DEFAULT_SIZE, GO_POINT, GO_COLOR, PASS, NO_POINT, opponent
 from board import GoBoard
 from board_util import GoBoardUtil
 from engine import GoEngine
+from root_stats import RootStats
+from policy_cache import PolicyCache
+from policy_state import PolicyState
+from opening_book import OpeningBook
+from solver import Solver, WIN, LOSS
+from threat_search import ThreatSearch
+from softmax_policy import SoftmaxPolicy
+import math
 import random
+import threading
+import time
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+
+"""
+Seconds kept in reserve before the time limit of a move
+"""
+TIME_MARGIN = 0.1
+"""
+Share of the time left that the endgame solver may use before genmove
+falls back to simulations
+"""
+ENDGAME_TIME_FRACTION = 0.5
+"""
+Share of the time left for the threat-space search at the root
+"""
+THREAT_TIME_FRACTION = 0.2
+"""
+Number of the best simulation candidates checked by the threat search,
+and the share of the time left that the simulations leave for all of
+these checks
+"""
+DEFAULT_VERIFY_CANDIDATES = 3
+VERIFY_TIME_FRACTION = 0.1
+"""
+Number of plies after which playouts stop and the position is evaluated
+"""
+DEFAULT_PLAYOUT_DEPTH = 20
+"""
+Weights of the static evaluation at the end of truncated playouts:
+per captured pair, per point that completes a five,
+and per point that makes an open four
+"""
+CAPTURE_WEIGHT = 0.5
+FOUR_WEIGHT = 1.0
+OPEN_THREE_WEIGHT = 0.5
+"""
+Seconds between two looks at the counts of the workers of parallel_simulation
+"""
+POLL_INTERVAL = 0.01
 
 EMPTY = GO_COLOR(0)
 BLACK = GO_COLOR(1)
 WHITE = GO_COLOR(2)
 BORDER = GO_COLOR(3)
+COLOR_NAMES = {BLACK: "b", WHITE: "w"}
 class Go0(GoEngine):
     def __init__(self) -> None:
         """
@@ -31,6 +83,29 @@ class Go0(GoEngine):
         """
         GoEngine.__init__(self, "Go0", 1.0)
         self._policy_type = "random"
+        self.time_limit = 1
+        # end of the time limit of the current move, set by start_clock
+        self.deadline = 0.0
+        self.num_workers = 1
+        self.stop_confidence: Optional[float] = 0.95
+        self.policy_cache = PolicyCache()
+        self.incremental_policy = True
+        self.candidate_moves = True
+        self.playout_depth: Optional[int] = DEFAULT_PLAYOUT_DEPTH
+        self.use_last_good_reply = True
+        self.softmax_policy = SoftmaxPolicy()
+        self.softmax_playouts = False
+        # (color, previous move) -> reply that color played in a won playout
+        self.last_good_reply: Dict[Tuple[GO_COLOR, GO_POINT], GO_POINT] = {}
+        self.rave_equivalence = 10
+        self.opening_book = OpeningBook()
+        self.solver = Solver()
+        self.endgame_threshold = 12
+        self.threat_search = ThreatSearch()
+        self.verify_candidates = DEFAULT_VERIFY_CANDIDATES
+        self._ponder_board: Optional[GoBoard] = None
+        self._ponder_stats: Optional[RootStats] = None
+        self._ponder_replies: Dict[GO_POINT, RootStats] = {}
 
     def set_policy(self, policy_type: str) -> None:
         """
@@ -43,8 +118,107 @@ class Go0(GoEngine):
         Get the policy type
         """
         return self._policy_type
+
+    def set_time_limit(self, time_limit: float) -> None:
+        self.time_limit = time_limit
+
+    def start_clock(self) -> None:
+        """
+        Start the time limit of a move. Each stage of the move then
+        uses a share of the time left until self.deadline.
+        """
+        self.deadline = time.time() + self.time_limit - TIME_MARGIN
+
+    def time_left(self) -> float:
+        return max(0.0, self.deadline - time.time())
+
+    def set_stop_confidence(self, confidence: Optional[float]) -> None:
+        """
+        Set the confidence for stopping policy_simulation early,
+        or None to always run all simulations
+        """
+        assert confidence is None or 0 < confidence < 1
+        self.stop_confidence = confidence
+
+    def set_policy_cache_size(self, size: int) -> None:
+        """
+        Set the maximum number of rule_based results kept in the cache
+        """
+        self.policy_cache.resize(size)
+
+    def set_rave_equivalence(self, equivalence: float) -> None:
+        """
+        Set the number of simulations at which real and AMAF win rates
+        have about equal weight; 0 turns RAVE off
+        """
+        assert equivalence >= 0
+        self.rave_equivalence = equivalence
+
+    def set_candidate_moves(self, candidate_moves: bool) -> None:
+        """
+        Restrict random moves in simulations to points close to a stone
+        """
+        self.candidate_moves = candidate_moves
+
+    def set_last_good_reply(self, use_last_good_reply: bool) -> None:
+        """
+        Turn the last-good-reply table of the playouts on or off.
+        Turning it off also clears the table.
+        """
+        self.use_last_good_reply = use_last_good_reply
+        if not use_last_good_reply:
+            self.last_good_reply.clear()
+
+    def set_softmax_playouts(self, softmax_playouts: bool) -> None:
+        """
+        Sample playout moves from the softmax policy instead of
+        following the rule-based policy
+        """
+        self.softmax_playouts = softmax_playouts
+
+    def set_playout_depth(self, depth: Optional[int]) -> None:
+        """
+        Stop playouts after depth plies and score them with evaluate,
+        or play them to the end of the game if depth is None
+        """
+        assert depth is None or depth >= 1
+        self.playout_depth = depth
+
+    def set_verify_candidates(self, num_candidates: int) -> None:
+        """
+        Check the num_candidates best moves of policy_simulation with
+        the threat search, or none if num_candidates is 0
+        """
+        assert num_candidates >= 0
+        self.verify_candidates = num_candidates
+
+    def set_endgame_threshold(self, threshold: int) -> None:
+        """
+        Use the exact solver when at most threshold points are empty
+        """
+        self.endgame_threshold = threshold
+
+    def set_num_workers(self, num_workers: int) -> None:
+        """
+        Set the number of processes used by policy_simulation
+        """
+        assert num_workers >= 1
+        self.num_workers = num_workers
     def get_move(self, board: GoBoard, color: GO_COLOR) -> GO_POINT:
+        self.start_clock()
+        if board.current_player == color:
+            book_move = self.opening_book.lookup(board)
+            if book_move is not None:
+                return [book_move]
         empty = len(board.get_empty_points())
+        if 0 < empty <= self.endgame_threshold and board.current_player == color:
+            solved_move = self.endgame_move(board)
+            if solved_move is not None:
+                return [solved_move]
+        if board.current_player == color:
+            forced_move = self.threat_search.search(board, self.time_left() * THREAT_TIME_FRACTION)
+            if forced_move is not None:
+                return [forced_move]
         win_moves = [27,28,29,35,36,37,43,44,45]
         random.shuffle(win_moves)
         # print(board.get_empty_points())
@@ -88,16 +262,46 @@ class Go0(GoEngine):
                         if move in board.get_empty_points():
                             moves = [move]
             else:
-                print("simulating")
                 moves = self.generate_moves(board, color)
         return moves
-    def solve(self, board: GoBoard):
+    def endgame_move(self, board: GoBoard) -> Optional[GO_POINT]:
+        """
+        Solve board exactly for the player to move.
+        Returns a proven winning or drawing move, or None if the solver
+        ran out of time or proved a loss, in which case simulations
+        are used to pick the move.
         """
-        A2: Implement your search algorithm to solve a board
-        Change if deemed necessary
+        value, move = self.solver.solve(board, self.time_left() * ENDGAME_TIME_FRACTION)
+        if value is None or value == LOSS:
+            return None
+        return move
+
+    def solve(self, board: GoBoard) -> Tuple[str, Optional[GO_POINT]]:
+        """
+        Solve board for the player to move within the time limit.
+        Returns the winner "b", "w" or "draw", or "unknown" on timeout,
+        and the winning or drawing move if the player to move has one.
         """
-        pass
-        
+        winner = board.detect_five_in_a_row()
+        if winner == EMPTY and board.get_captures(BLACK) >= 10:
+            winner = BLACK
+        elif winner == EMPTY and board.get_captures(WHITE) >= 10:
+            winner = WHITE
+        if winner != EMPTY:
+            return COLOR_NAMES[winner], None
+        if board.get_empty_points().size == 0:
+            return "draw", None
+
+        value, move = self.solver.solve(board, self.time_limit - TIME_MARGIN)
+        if value is None:
+            return "unknown", None
+        elif value == WIN:
+            return COLOR_NAMES[board.current_player], move
+        elif value == LOSS:
+            return COLOR_NAMES[opponent(board.current_player)], None
+        else:
+            return "draw", move
+
     def random_simulation(self, board: GoBoard, color: GO_COLOR) -> GO_POINT:
         """
         Returns a move for a random simulation player
@@ -114,7 +318,7 @@ class Go0(GoEngine):
         """
         num_simulations = 10
         # get list of all legal moves
-        legal_moves = GoBoardUtil.generate_legal_moves(board, color)
+        legal_moves = self.simulation_moves(board, color)
         # initialize a dictionary to store the win percentage for each legal move
         win_percentage = dict.fromkeys(legal_moves, 0)
 
@@ -127,7 +331,7 @@ class Go0(GoEngine):
                 cboard = board.copy()
                 cboard.play_move(move, color)
                 while not cboard.end_of_game():
-                    random_moves = GoBoardUtil.generate_legal_moves(cboard, cboard.current_player)
+                    random_moves = self.simulation_moves(cboard, cboard.current_player)
                     if random_moves == []:
                         break
                     random.shuffle(random_moves)
@@ -142,54 +346,447 @@ class Go0(GoEngine):
 
     def policy_simulation(self, board: GoBoard, color: GO_COLOR) -> GO_POINT:
         """
-        Returns a move for a random simulation player
-            Part 1: simulation-based ninuki player
+        Returns a move for a rule-based simulation player
+
+            The candidate moves at the root are the moves of the rule-based policy.
+            Each candidate gets num_simulations simulations, played in rounds so that
+            all candidates have the same number of samples at any time.
+            Every simulation follows the rule-based policy until the game is over
+            (win or draw). The candidate with the highest win percentage is returned.
+
+            Statistics gathered by pondering on this position are added
+            to the statistics of this search.
+            With more than one worker, the simulations are run by
+            parallel_simulation instead.
+
+            If stop_confidence is set, the search stops after any round in which
+            the leading candidate is better than all others with that confidence.
+            The test is repeated after every round, so the error probability
+            1 - stop_confidence is split evenly over all the rounds.
+            The search also stops before self.deadline, so start_clock must be
+            called first.
+
+            Every simulation also updates the AMAF statistics of all points
+            played by color, and the final choice blends them in as in RAVE.
+
+            The best candidates are then checked by verified_best_move.
+        """
+        board = self.playout_board(board)
+        moves = list(dict.fromkeys(self.playout_moves(board, color)))
+        stats = self.root_search(board, color, moves)
+        return self.verified_best_move(board, moves, stats)
 
-            A simulation consists of a series of moves generated uniformly at random,
-            and ends when the game is over (win or draw).
+    def root_search(self, board: GoBoard, color: GO_COLOR, moves: List[GO_POINT],
+                    num_simulations: int = 20) -> RootStats:
+        """
+        Run num_simulations simulations for each of moves, in rounds,
+        as described in policy_simulation, and return their statistics.
+        The simulations stop early enough to leave VERIFY_TIME_FRACTION
+        of the time left for the checks of the best moves.
+        """
+        stats = self.take_ponder_stats(board, color)
+        deadline = time.time() + self.time_left() * (1 - VERIFY_TIME_FRACTION)
+        if self.num_workers > 1:
+            self.parallel_simulation(board, color, moves, num_simulations, stats, deadline)
+        else:
+            delta = self.stop_delta(num_simulations)
+            for i in range(num_simulations):
+                for move in moves:
+                    if time.time() > deadline:
+                        break
+                    self.run_simulation(board, color, move, stats)
+                if time.time() > deadline:
+                    break
+                if delta is not None and stats.confident_best(moves, delta) is not None:
+                    break
+        return stats
+
+    def stop_delta(self, num_checks: int) -> Optional[float]:
+        """
+        Error probability of each of num_checks early stopping tests,
+        so that all of them together err with probability at most
+        1 - stop_confidence, or None if early stopping is off
+        """
+        if self.stop_confidence is None:
+            return None
+        return (1 - self.stop_confidence) / max(1, num_checks)
 
-            The player runs N=10 simulations for each legal move, and picks one move with the highest win
-            percentage. See simulation_player.py for a sample implementation of the algorithm.
-            You are free to break ties between equally good moves in any way you wish.
+    def ranked_moves(self, moves: List[GO_POINT], stats: RootStats) -> List[GO_POINT]:
+        """
+        moves sorted by decreasing win rate, blended with AMAF as in best_move
+        """
+        return sorted(moves, key=lambda move: stats.rave_value(move, self.rave_equivalence),
+                      reverse=True)
 
-            As in assignment 1, your player should resign or pass only when the game is over.
+    def analyze_moves(self, board: GoBoard, color: GO_COLOR,
+                      num_moves: int) -> List[Tuple[GO_POINT, float, int, Optional[int]]]:
         """
-        num_simulations = 20
-        # get list of all legal moves
-        legal_moves = GoBoardUtil.generate_legal_moves(board, color)
-        # initialize a dictionary to store the win percentage for each legal move
-        win_percentage = dict.fromkeys(legal_moves, 0)
+        Analyze the num_moves best moves for color in one simulation search
+        over all moves of random simulations, not only the moves of the
+        rule-based policy.
+        Returns (move, win rate, number of simulations, proven value)
+        for each of them, best first. The proven value is WIN or LOSS if
+        the threat search of verified_best_move proves it, otherwise None.
+        """
+        self.start_clock()
+        board = self.playout_board(board)
+        moves = list(dict.fromkeys(self.simulation_moves(board, color)))
+        stats = self.root_search(board, color, moves)
+        ranked = self.ranked_moves(moves, stats)[:num_moves]
+        analysis = []
+        for i, move in enumerate(ranked):
+            time_limit = self.time_left() / (len(ranked) - i)
+            proven = self.threat_search.check_move(board, move, time_limit)
+            analysis.append((move, stats.win_rate(move), int(stats.visits[move]), proven))
+        return analysis
+
+    def verified_best_move(self, board: GoBoard, moves: List[GO_POINT],
+                           stats: RootStats) -> GO_POINT:
+        """
+        Check the verify_candidates best moves by simulation with a
+        bounded threat search, sharing the time left among them.
+        Returns the best of them that starts a forced win, otherwise the
+        best of them after which the opponent has no forced win,
+        otherwise the best move that was not checked.
+        """
+        ranked = self.ranked_moves(moves, stats)
+        if len(ranked) == 0:
+            return PASS
+        checked = ranked[:self.verify_candidates]
+        safe: List[GO_POINT] = []
+        for i, move in enumerate(checked):
+            time_limit = self.time_left() / (len(checked) - i)
+            result = self.threat_search.check_move(board, move, time_limit)
+            if result == WIN:
+                return move
+            if result != LOSS:
+                safe.append(move)
+        if len(safe) > 0:
+            return safe[0]
+        if len(ranked) > len(checked):
+            return ranked[len(checked)]
+        return ranked[0]
+
+    def parallel_simulation(self, board: GoBoard, color: GO_COLOR, moves: List[GO_POINT],
+                            num_simulations: int, stats: RootStats, deadline: float) -> None:
+        """
+        Run the simulations for moves in self.num_workers processes
+        and add their counts to stats.
+
+        Each worker searches the same root independently and writes its counts
+        into its own block of a shared memory array, so no locking is needed.
+        Every POLL_INTERVAL, the counts are summed, and each time all moves
+        have one more simulation, the early stopping test of root_search is
+        applied. If it passes, a stop flag after the blocks tells the
+        workers to finish. The counts are read when all workers are done,
+        or at the deadline.
+        Each worker also sends the changes it made to its copy of the
+        last-good-reply table through a queue, and they are merged
+        into self.last_good_reply.
+        """
+        num_rounds = -(-num_simulations // self.num_workers)
+        delta = self.stop_delta(num_rounds * self.num_workers)
+        size = RootStats.nbytes(board.maxpoint)
+        shm = shared_memory.SharedMemory(create=True, size=size * self.num_workers + 8)
+        try:
+            shm.buf[:] = bytes(len(shm.buf))
+            stop = np.ndarray((1,), dtype=np.float64, buffer=shm.buf,
+                              offset=size * self.num_workers)
+            blocks = [RootStats(board.maxpoint, shm.buf, i) for i in range(self.num_workers)]
+            replies: multiprocessing.Queue = multiprocessing.Queue()
+            workers = [multiprocessing.Process(
+                target=simulation_worker,
+                args=(self, board, color, moves, shm.name, i, num_rounds, deadline, replies),
+                daemon=True) for i in range(self.num_workers)]
+            for worker in workers:
+                worker.start()
+            checked_rounds = 0
+            reported = 0
+            while time.time() < deadline and any(worker.is_alive() for worker in workers):
+                time.sleep(POLL_INTERVAL)
+                reported += self.merge_reply_changes(replies, self.num_workers - reported, 0.0)
+                if delta is None:
+                    continue
+                total = RootStats(board.maxpoint)
+                total.merge(stats)
+                for block in blocks:
+                    total.merge(block)
+                rounds = int(min(total.visits[move] for move in moves))
+                if rounds > checked_rounds:
+                    checked_rounds = rounds
+                    if total.confident_best(moves, delta) is not None:
+                        stop[0] = 1
+                        break
+            self.merge_reply_changes(replies, self.num_workers - reported,
+                                     max(0.0, deadline - time.time()) + POLL_INTERVAL)
+            for worker in workers:
+                worker.join(max(0.0, deadline - time.time()))
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            for block in blocks:
+                stats.merge(block)
+            del blocks
+            del stop
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def merge_reply_changes(self, replies: multiprocessing.Queue, count: int,
+                            timeout: float) -> int:
+        """
+        Merge at most count tables of last-good-reply changes sent by
+        simulation workers into self.last_good_reply, waiting at most
+        timeout seconds for each. A reply of None removes the entry.
+        Returns the number of tables merged.
+        """
+        merged = 0
+        while merged < count:
+            try:
+                changes = replies.get(timeout=timeout) if timeout > 0 else replies.get_nowait()
+            except queue.Empty:
+                break
+            for key, reply in changes.items():
+                if reply is None:
+                    self.last_good_reply.pop(key, None)
+                else:
+                    self.last_good_reply[key] = reply
+            merged += 1
+        return merged
+
+    def playout_board(self, board: GoBoard) -> GoBoard:
+        """
+        Returns a copy of board to run simulations from.
+        With incremental_policy, the copy has a PolicyState, so that every
+        playout copied from it only searches the lines changed by its moves.
+        """
+        board = board.copy()
+        if self.incremental_policy and board.policy_state is None:
+            board.policy_state = PolicyState(board)
+        return board
 
-        # for each legal move in the list, run num_simulations, where each simulation is a series of moves
-        # generated uniformly at random until the game is over (win or draw) and store the win percentage
+    def run_simulation(self, board: GoBoard, color: GO_COLOR, move: GO_POINT,
+                       stats: RootStats) -> None:
+        """
+        Run one simulation starting with move and record it in stats,
+        including the AMAF counts of the points played by color
+        """
+        played: List[GO_POINT] = []
+        winner = self.simulate(board, color, move, amaf=played)
+        stats.add(move, winner == color)
+        stats.add_amaf(played, winner == color)
+
+    def simulate(self, board: GoBoard, color: GO_COLOR, move: GO_POINT,
+                 stop: Optional[threading.Event] = None,
+                 amaf: Optional[List[GO_POINT]] = None) -> Optional[GO_COLOR]:
+        """
+        Play move for color on a copy of board, then follow the rule-based
+        policy, or the softmax policy if softmax_playouts is set,
+        until the game is over, or for at most playout_depth plies.
+        If amaf is given, every point played by color is appended to it.
+        Returns the result of end_of_game() for the final position,
+        or None if stop was set before the game ended.
+        A truncated playout returns color or its opponent, drawn with
+        the probability given by evaluate.
+        The moves of the playout update the last-good-reply table.
+        """
         cboard = board.copy()
-        tple = self.rule_based(cboard, color)
-        moves = tple[1]
-        for m in moves:
-            # one_deep_board = board.copy()
+        replies = [(color, cboard.last_move, move)]
+        cboard.play_move(move, color)
+        if amaf is not None:
+            amaf.append(move)
+        plies = 0
+        winner = cboard.end_of_game()
+        while not winner:
+            if stop is not None and stop.is_set():
+                return None
+            if self.playout_depth is not None and plies >= self.playout_depth:
+                winner = color if random.random() < self.evaluate(cboard, color) else opponent(color)
+                break
+            plies += 1
+            if self.softmax_playouts:
+                point = self.softmax_policy.sample(cboard, cboard.current_player)
+                if point == PASS:
+                    break
+            else:
+                theMove = self.playout_moves(cboard, color, use_reply=True)
+                if len(theMove) == 0:
+                    break
+                point = random.choice(theMove)
+            if amaf is not None and cboard.current_player == color:
+                amaf.append(point)
+            replies.append((cboard.current_player, cboard.last_move, point))
+            cboard.play_move(point, cboard.current_player)
+            winner = cboard.end_of_game()
+        self.update_replies(replies, winner)
+        return winner
+
+    def update_replies(self, replies: List[Tuple[GO_COLOR, GO_POINT, GO_POINT]],
+                       winner: GO_COLOR) -> None:
+        """
+        Last-good-reply with forgetting: store the replies of the winner
+        of a playout, and forget the stored replies that the loser played.
+        replies holds (color, previous move, reply) for every move of the playout.
+        Draws change nothing.
+        """
+        if not self.use_last_good_reply or winner is True or winner not in (BLACK, WHITE):
+            return
+        for color, previous, reply in replies:
+            key = (color, previous)
+            if color == winner:
+                self.last_good_reply[key] = reply
+            elif self.last_good_reply.get(key) == reply:
+                del self.last_good_reply[key]
+
+    def evaluate(self, board: GoBoard, color: GO_COLOR) -> float:
+        """
+        Fast static estimate of the probability that color wins board:
+        a logistic function of the capture balance and of the balance of
+        threats, counted as points that complete a five or make an open four.
+        The player to move wins if it can complete a five.
+        """
+        to_play = board.current_player
+        if len(board.win_search(to_play)) > 0:
+            return 1.0 if to_play == color else 0.0
+        O = opponent(color)
+        score = CAPTURE_WEIGHT * (board.get_captures(color) - board.get_captures(O)) / 2
+        score += FOUR_WEIGHT * (len(set(board.win_search(color))) - len(set(board.win_search(O))))
+        score += OPEN_THREE_WEIGHT * (len(set(board.open_four(color))) - len(set(board.open_four(O))))
+        return 1 / (1 + math.exp(-score))
+
+    def simulation_moves(self, board: GoBoard, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        The legal moves considered by random simulations:
+        only the candidate moves close to a stone if candidate_moves is set
+        """
+        if self.candidate_moves:
+            return GoBoardUtil.generate_candidate_moves(board, color)
+        return GoBoardUtil.generate_legal_moves(board, color)
 
-            for i in range(num_simulations):
-                cboard = board.copy()
-                tple = self.rule_based(cboard, color)
-                moves = tple[1]
-                random.shuffle(moves)
-                move = moves[0]
-                # print(move)
-                cboard.play_move(move, color)
-                while not cboard.end_of_game():
-                    tple = self.rule_based(cboard, color)
-                    # print(tple)
-                    theMove = tple[1]
-                    random.shuffle(theMove)
-                    # print(theMove)
-                    cboard.play_move(theMove[0], cboard.current_player)
+    def playout_moves(self, board: GoBoard, color: GO_COLOR,
+                      use_reply: bool = False) -> List[GO_POINT]:
+        """
+        The moves of the rule-based policy, as used in simulations.
+        When the policy falls back to random moves, and use_reply is set,
+        the last good reply to the previous move is played if it is legal.
+        Otherwise only the candidate moves close to a stone are used
+        if candidate_moves is set.
+        """
+        scenario, moves = self.rule_based(board, color)
+        if scenario != "Random":
+            return moves
+        if use_reply and self.use_last_good_reply:
+            reply = self.last_good_reply.get((board.current_player, board.last_move))
+            if reply is not None and reply < board.maxpoint and board.is_legal(reply, board.current_player):
+                return [reply]
+        if self.candidate_moves:
+            return GoBoardUtil.generate_candidate_moves(board, color)
+        return moves
 
-                if cboard.end_of_game() == color:
-                    win_percentage[move] += (1 / num_simulations)
-            print(win_percentage)
-        return max(win_percentage, key=win_percentage.get)
+    def ponder(self, board: GoBoard, stop: threading.Event) -> None:
+        """
+        Run simulations on board until stop is set.
+        Called by the GTP connection in a background thread while it waits
+        for the next command.
+
+        Simulations are recorded for the side to move, and for each of its
+        moves also the replies of the opponent. The next genmove can use them
+        if it is asked on this position or on this position plus one move.
+        """
+        self._advance_ponder_root(board)
+        board = self.playout_board(board)
+        color = board.current_player
+        moves = list(dict.fromkeys(self.playout_moves(board, color)))
+        if len(moves) == 0 or board.end_of_game():
+            return
+        while not stop.is_set():
+            move = random.choice(moves)
+            cboard = board.copy()
+            cboard.play_move(move, color)
+            if cboard.end_of_game():
+                self._ponder_stats.add(move, cboard.end_of_game() == color)
+                continue
+            replies = list(dict.fromkeys(self.playout_moves(cboard, opponent(color))))
+            if len(replies) == 0:
+                continue
+            reply = random.choice(replies)
+            played: List[GO_POINT] = []
+            winner = self.simulate(cboard, opponent(color), reply, stop, amaf=played)
+            if winner is None:
+                return
+            self._ponder_stats.add(move, winner == color)
+            if move not in self._ponder_replies:
+                self._ponder_replies[move] = RootStats(board.maxpoint)
+            self._ponder_replies[move].add(reply, winner == opponent(color))
+            self._ponder_replies[move].add_amaf(played, winner == opponent(color))
+
+    def _advance_ponder_root(self, board: GoBoard) -> None:
+        """
+        Make board the root of pondering.
+        If board follows the previous root by one move, the replies pondered
+        for that move become the statistics of the new root.
+        """
+        if self._ponder_board is not None:
+            if same_position(self._ponder_board, board):
+                return
+            if self._ponder_child(board):
+                self._ponder_board = board.copy()
+                self._ponder_stats = self._ponder_replies.get(
+                    board.last_move, RootStats(board.maxpoint))
+                self._ponder_replies = {}
+                return
+        self._ponder_board = board.copy()
+        self._ponder_stats = RootStats(board.maxpoint)
+        self._ponder_replies = {}
+
+    def _ponder_child(self, board: GoBoard) -> bool:
+        """
+        Check whether board is the pondering root plus the move board.last_move
+        """
+        move = board.last_move
+        if move == PASS or move == NO_POINT:
+            return False
+        if self._ponder_board.get_color(move) != EMPTY:
+            return False
+        cboard = self._ponder_board.copy()
+        cboard.play_move(move, self._ponder_board.current_player)
+        return same_position(cboard, board)
+
+    def take_ponder_stats(self, board: GoBoard, color: GO_COLOR) -> RootStats:
+        """
+        Return the statistics pondered for color to play on board,
+        or empty statistics if there are none.
+        The pondered statistics are handed over and cleared.
+        """
+        stats = RootStats(board.maxpoint)
+        if self._ponder_board is None or board.current_player != color:
+            return stats
+        if same_position(self._ponder_board, board):
+            stats.merge(self._ponder_stats)
+        elif self._ponder_child(board) and board.last_move in self._ponder_replies:
+            stats.merge(self._ponder_replies[board.last_move])
+        self._ponder_board = None
+        self._ponder_stats = None
+        self._ponder_replies = {}
+        return stats
 
     def rule_based(self, board: GoBoard, color: GO_COLOR) -> tuple[str, Any]:
+        """
+        Returns the category and the moves of the rule-based policy.
+        Results are memoized in self.policy_cache, keyed by the board size,
+        the position hash, the capture counts and color. The size is needed
+        because the empty board hashes to 0 at every size.
+        """
+        key = (board.size, board.hash, board.black_captures, board.white_captures, color)
+        cached = self.policy_cache.get(key)
+        if cached is not None:
+            return cached[0], list(cached[1])
+        category, moves = self._rule_based(board, color)
+        self.policy_cache.put(key, (category, tuple(moves)))
+        return category, moves
+
+    def _rule_based(self, board: GoBoard, color: GO_COLOR) -> tuple[str, Any]:
         if color == BLACK:
             opponent = WHITE
         elif color == WHITE:
@@ -250,6 +847,52 @@ class Go0(GoEngine):
                 return "Random", [PASS]
             return [available_moves]
 
+def simulation_worker(engine: Go0, board: GoBoard, color: GO_COLOR, moves: List[GO_POINT],
+                      shm_name: str, block: int, num_rounds: int, deadline: float,
+                      replies: multiprocessing.Queue) -> None:
+    """
+    Worker process of Go0.parallel_simulation.
+    Runs num_rounds rounds of simulations for moves, or stops at the deadline
+    or when the stop flag after the blocks is set, and counts them in block
+    number block of the shared memory shm_name.
+    The changes to the last-good-reply table of the worker are put on
+    replies, as a dictionary in which None marks a removed entry.
+    Both random generators are seeded again, so that the workers do not
+    repeat the playouts of the process they were forked from.
+    """
+    random.seed()
+    np.random.seed()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    stats = RootStats(board.maxpoint, shm.buf, block)
+    stop = np.ndarray((1,), dtype=np.float64, buffer=shm.buf,
+                      offset=RootStats.nbytes(board.maxpoint) * engine.num_workers)
+    initial_replies = dict(engine.last_good_reply)
+    for i in range(num_rounds):
+        for move in moves:
+            if time.time() > deadline or stop[0] != 0:
+                break
+            engine.run_simulation(board, color, move, stats)
+    del stats
+    del stop
+    shm.close()
+    changes: Dict[Tuple[GO_COLOR, GO_POINT], Optional[GO_POINT]] = {
+        key: reply for key, reply in engine.last_good_reply.items()
+        if initial_replies.get(key) != reply}
+    for key in initial_replies:
+        if key not in engine.last_good_reply:
+            changes[key] = None
+    replies.put(changes)
+
+def same_position(board1: GoBoard, board2: GoBoard) -> bool:
+    """
+    Check whether two boards have the same stones, the same player to move
+    and the same capture counts
+    """
+    return board1.current_player == board2.current_player and \
+        board1.black_captures == board2.black_captures and \
+        board1.white_captures == board2.white_captures and \
+        np.array_equal(board1.board, board2.board)
+
 def run() -> None:
     """
     start the gtp connection and wait for commands.
@@ -12,7 +12,7 @@ The board uses a 1-dimensional representation with padding
 """
 
 import numpy as np
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 from board_base import (
     board_array_size,
@@ -32,6 +32,39 @@ from board_base import (
     GO_POINT,
 )
 
+"""
+Random 64-bit keys for Zobrist hashing of positions, indexed by [color][point].
+The generator is seeded so that every process computes the same hashes.
+"""
+ZOBRIST_SEED: int = 455
+ZOBRIST_KEYS: List[List[int]] = np.random.default_rng(ZOBRIST_SEED).integers(
+    1, 2**63, size=(3, board_array_size(MAXSIZE)), dtype=np.int64).tolist()
+
+"""
+Empty points within this distance (in rows and columns) of a stone
+are candidate moves
+"""
+CANDIDATE_DISTANCE: int = 2
+_NEIGHBORHOODS: Dict[int, List[np.ndarray]] = {}
+
+
+def neighborhoods(size: int) -> List[np.ndarray]:
+    """
+    For each point of the padded 1D board of the given size, the board
+    points within CANDIDATE_DISTANCE of it. Computed once per size.
+    """
+    if size not in _NEIGHBORHOODS:
+        NS = size + 1
+        result = [np.empty(0, dtype=np.int64)] * board_array_size(size)
+        for row in range(1, size + 1):
+            for col in range(1, size + 1):
+                result[NS * row + col] = np.array(
+                    [NS * r + c
+                     for r in range(max(1, row - CANDIDATE_DISTANCE), min(size, row + CANDIDATE_DISTANCE) + 1)
+                     for c in range(max(1, col - CANDIDATE_DISTANCE), min(size, col + CANDIDATE_DISTANCE) + 1)],
+                    dtype=np.int64)
+        _NEIGHBORHOODS[size] = result
+    return _NEIGHBORHOODS[size]
 
 """
 The GoBoard class implements a board and basic functions to play
@@ -123,6 +156,12 @@ class GoBoard(object):
                 self.diags.append(diag_NE)
         assert len(self.rows) == self.size
         assert len(self.cols) == self.size
+        # all lines in the order used by pattern search, and the lines through each point
+        self.lines = self.rows + self.cols + self.diags
+        self.point_lines: Dict[GO_POINT, List[int]] = {}
+        for index, line in enumerate(self.lines):
+            for pt in line:
+                self.point_lines.setdefault(pt, []).append(index)
         # assert len(self.diags) == (2 * (self.size - 5) + 1) * 2
 
     def reset(self, size: int) -> None:
@@ -142,6 +181,13 @@ class GoBoard(object):
         self.calculate_rows_cols_diags()
         self.black_captures = 0
         self.white_captures = 0
+        self.hash: int = 0
+        self.policy_state = None
+        # number of stones within CANDIDATE_DISTANCE of each point
+        self.nearby_stones: np.ndarray = np.zeros(self.maxpoint, dtype=np.int32)
+        self.neighborhoods: List[np.ndarray] = neighborhoods(size)
+        # (point, captured stones, previous last_move, previous last2_move) for undo
+        self.move_history: List[Tuple[GO_POINT, List[GO_POINT], GO_POINT, GO_POINT]] = []
 
     def copy(self) -> 'GoBoard':
         b = GoBoard(self.size)
@@ -153,6 +199,13 @@ class GoBoard(object):
         b.current_player = self.current_player
         assert b.maxpoint == self.maxpoint
         b.board = np.copy(self.board)
+        b.black_captures = self.black_captures
+        b.white_captures = self.white_captures
+        b.hash = self.hash
+        b.nearby_stones = np.copy(self.nearby_stones)
+        b.move_history = self.move_history.copy()
+        if self.policy_state is not None:
+            b.policy_state = self.policy_state.copy()
         return b
 
     def get_color(self, point: GO_POINT) -> GO_COLOR:
@@ -185,14 +238,11 @@ class GoBoard(object):
     def is_legal(self, point: GO_POINT, color: GO_COLOR) -> bool:
         """
         Check whether it is legal for color to play on point
-        This method tries to play the move on a temporary copy of the board.
-        This prevents the board from being modified by the move
         """
         if point == PASS:
             return True
-        board_copy: GoBoard = self.copy()
-        can_play_move = board_copy.play_move(point, color)
-        return can_play_move
+        # play_move only fails on occupied points
+        return self.board[point] == EMPTY
 
     def end_of_game(self) -> bool:
         if self.last_move == PASS and self.last2_move == PASS:
@@ -212,6 +262,17 @@ class GoBoard(object):
         """
         return where1d(self.board == EMPTY)
 
+    def get_candidate_points(self) -> np.ndarray:
+        """
+        Return:
+            The empty points within CANDIDATE_DISTANCE of a stone,
+            or all empty points if there are none
+        """
+        candidates = where1d((self.board == EMPTY) & (self.nearby_stones > 0))
+        if candidates.size == 0:
+            return self.get_empty_points()
+        return candidates
+
     def row_start(self, row: int) -> int:
         assert row >= 1
         assert row <= self.size
@@ -320,7 +381,13 @@ class GoBoard(object):
         if self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self.hash ^= ZOBRIST_KEYS[color][point]
+        self.nearby_stones[self.neighborhoods[point]] += 1
+        if self.policy_state is not None:
+            self.policy_state.touch(point)
         self.current_player = opponent(color)
+        captured: List[GO_POINT] = []
+        self.move_history.append((point, captured, self.last_move, self.last2_move))
         self.last2_move = self.last_move
         self.last_move = point
         O = opponent(color)
@@ -329,11 +396,98 @@ class GoBoard(object):
             if self.board[point+offset] == O and self.board[point+(offset*2)] == O and self.board[point+(offset*3)] == color:
                 self.board[point+offset] = EMPTY
                 self.board[point+(offset*2)] = EMPTY
+                captured.append(point+offset)
+                captured.append(point+(offset*2))
+                self.hash ^= ZOBRIST_KEYS[O][point+offset] ^ ZOBRIST_KEYS[O][point+(offset*2)]
+                self.nearby_stones[self.neighborhoods[point+offset]] -= 1
+                self.nearby_stones[self.neighborhoods[point+(offset*2)]] -= 1
+                if self.policy_state is not None:
+                    self.policy_state.touch(point+offset)
+                    self.policy_state.touch(point+(offset*2))
                 if color == BLACK:
                     self.black_captures += 2
                 else:
                     self.white_captures += 2
         return True
+
+    def undo(self) -> None:
+        """
+        Take back the last move played with play_move, including its captures
+        """
+        point, captured, last_move, last2_move = self.move_history.pop()
+        color = int(self.board[point])
+        O = opponent(color)
+        self.board[point] = EMPTY
+        self.hash ^= ZOBRIST_KEYS[color][point]
+        self.nearby_stones[self.neighborhoods[point]] -= 1
+        for stone in captured:
+            self.board[stone] = O
+            self.hash ^= ZOBRIST_KEYS[O][stone]
+            self.nearby_stones[self.neighborhoods[stone]] += 1
+        if color == BLACK:
+            self.black_captures -= len(captured)
+        else:
+            self.white_captures -= len(captured)
+        if self.policy_state is not None:
+            self.policy_state.touch(point)
+            for stone in captured:
+                self.policy_state.touch(stone)
+        self.current_player = color
+        self.last_move = last_move
+        self.last2_move = last2_move
+
+    def captures_by(self, point: GO_POINT, color: GO_COLOR) -> int:
+        """
+        Number of stones color would capture by playing on the empty point
+        """
+        O = opponent(color)
+        count = 0
+        for offset in [1, -1, self.NS, -self.NS, self.NS+1, -(self.NS+1), self.NS-1, -self.NS+1]:
+            if self.board[point+offset] == O and self.board[point+(offset*2)] == O and self.board[point+(offset*3)] == color:
+                count += 2
+        return count
+
+    def immediate_wins(self, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        Returns the empty points where color wins at once,
+        by five in a row or by reaching 10 captures.
+        Unlike win_search, this checks every point directly,
+        so it also finds fives longer than the patterns.
+        """
+        wins: List[GO_POINT] = []
+        captures = self.get_captures(color)
+        for point in self.get_empty_points():
+            gained = self.captures_by(point, color)
+            if captures + gained >= 10:
+                wins.append(point)
+                continue
+            # captures only remove opponent stones, so they cannot make five
+            self.board[point] = color
+            won = self.five_through(point)
+            self.board[point] = EMPTY
+            if won:
+                wins.append(point)
+        return wins
+
+    def five_through(self, point: GO_POINT) -> bool:
+        """
+        Check whether the stone on point is part of five or more in a row.
+        Faster than detect_five_in_a_row when only the last move can have made five.
+        """
+        c = self.board[point]
+        for offset in [1, self.NS, self.NS + 1, self.NS - 1]:
+            num_found = 1
+            p = point + offset
+            while self.board[p] == c:
+                num_found += 1
+                p += offset
+            p = point - offset
+            while self.board[p] == c:
+                num_found += 1
+                p -= offset
+            if num_found >= 5:
+                return True
+        return False
     
     def neighbors_of_color(self, point: GO_POINT, color: GO_COLOR) -> List:
         """ List of neighbors of point of given color """
@@ -402,28 +556,28 @@ class GoBoard(object):
                 return prev
         return EMPTY
 
+    def line_colors(self, index: int) -> List[GO_COLOR]:
+        """
+        Returns the colors of the points on line number index of self.lines
+        """
+        return self.board[self.lines[index]].tolist()
+
+    def _search_lines(self, patterns: List[List[GO_COLOR]]) -> List[Tuple]:
+        """
+        Search patterns in all rows, columns and diagonals.
+        Returns a list of (pattern, line index, start index) in the same
+        format and order as search_patterns.
+        If the board has a policy_state, unchanged lines are not searched again.
+        """
+        if self.policy_state is not None:
+            return self.policy_state.search(self, patterns)
+        return search_patterns(patterns, [self.line_colors(i) for i in range(len(self.lines))])
+
     def win_search(self,color):
         win_moves = []
-        stones = []
-        stone = []
-        for r in self.rows:
-            for i in r:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for c in self.cols:
-            for i in c:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for d in self.diags:
-            for i in d:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
 
         if color == WHITE:
-            result = search_patterns(IMMEDIATE_WIN_WHITE,stones)
+            result = self._search_lines(IMMEDIATE_WIN_WHITE)
             for i in range(len(result)):
                 pattern = result[i][0]
                 ind = result[i][2]
@@ -437,7 +591,7 @@ class GoBoard(object):
                 win_moves.append(win_move)
 
         elif color == BLACK:
-            result = search_patterns(IMMEDIATE_WIN_BLACK, stones)
+            result = self._search_lines(IMMEDIATE_WIN_BLACK)
             for i in range(len(result)):
                 pattern = result[i][0]
                 ind = result[i][2]
@@ -450,37 +604,19 @@ class GoBoard(object):
                 win_move = boards[winr][winc]
                 win_moves.append(win_move)
 
-
-            if self.black_captures == 8:
-                # move = self.get_empty_points()
-                # win_moves.append(move)
-                pass
-
+        # with 8 captures, any capture reaches the 10 stones that win
+        if self.get_captures(color) >= 8:
+            for move in self.capture(color):
+                if move not in win_moves:
+                    win_moves.append(move)
         return win_moves
 
     def block_win(self,color):
-        stones = []
-        stone = []
         block_moves = []
         color = opponent(color)
-        for r in self.rows:
-            for i in r:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for c in self.cols:
-            for i in c:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for d in self.diags:
-            for i in d:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
         # print(stones)
         if color == WHITE:
-            result = search_patterns(IMMEDIATE_WIN_WHITE,stones)
+            result = self._search_lines(IMMEDIATE_WIN_WHITE)
             # print(result)
             for i in range(len(result)):
                 pattern = result[i][0]
@@ -510,12 +646,13 @@ class GoBoard(object):
 
 
         elif color == BLACK:
-            result = search_patterns(IMMEDIATE_WIN_BLACK, stones)
+            result = self._search_lines(IMMEDIATE_WIN_BLACK)
             pattern = []
             for i in range(len(result)):
                 pattern = result[i][0]
+                ind = result[i][2]
                 winr = result[i][1]
-                winc = pattern.index(EMPTY)
+                winc = pattern.index(EMPTY) + ind
                 boards = []
                 for board in self.rows+self.cols+self.diags:
                     boards.append(board)
@@ -542,26 +679,9 @@ class GoBoard(object):
     DEBUG THIS
     '''
     def open_four(self,color):
-        stones = []
-        stone = []
         open4_moves =[]
-        for r in self.rows:
-            for i in r:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for c in self.cols:
-            for i in c:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for d in self.diags:
-            for i in d:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
         if color == WHITE:
-            result = search_patterns(OPEN_FOUR_WHITE,stones)
+            result = self._search_lines(OPEN_FOUR_WHITE)
             for i in range(len(result)):
                 pattern = result[i][0]
                 realind = -1
@@ -582,7 +702,7 @@ class GoBoard(object):
                 win_move = boards[winr][winc]
                 open4_moves.append(win_move)
         elif color == BLACK:
-            result = search_patterns(OPEN_FOUR_BLACK, stones)
+            result = self._search_lines(OPEN_FOUR_BLACK)
             for i in range(len(result)):
                 pattern = result[i][0]
                 realind = -1
@@ -609,27 +729,10 @@ class GoBoard(object):
     DEBUG
     '''
     def capture(self,color):
-        stones = []
-        stone = []
         capture_move = []
-        for r in self.rows:
-            for i in r:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for c in self.cols:
-            for i in c:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for d in self.diags:
-            for i in d:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
         #print(stones)
         if color == WHITE:
-            result = search_patterns(WHITE_CAPTURE, stones)
+            result = self._search_lines(WHITE_CAPTURE)
             for i in range(len(result)):
                 pattern = result[i][0]
                 ind = result[i][2]
@@ -648,7 +751,7 @@ class GoBoard(object):
 
 
         elif color == BLACK:
-            result = search_patterns(BLACK_CAPTURE, stones)
+            result = self._search_lines(BLACK_CAPTURE)
             # print(result)
             for i in range(len(result)):
                 pattern = result[i][0]
@@ -670,26 +773,9 @@ class GoBoard(object):
         return capture_move
 
     def protect(self,color):
-        stones = []
-        stone = []
         protect_moves = []
-        for r in self.rows:
-            for i in r:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for c in self.cols:
-            for i in c:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
-        for d in self.diags:
-            for i in d:
-                stone.append(self.get_color(i))
-            stones.append(stone)
-            stone = []
         if color == BLACK:
-            result = search_patterns(PROTECT_CAPTURE_BLACK, stones)
+            result = self._search_lines(PROTECT_CAPTURE_BLACK)
             for i in range(len(result)):
                 pattern = result[i][0]
                 ind = result[i][2]
@@ -32,6 +32,16 @@ class GoBoardUtil(object):
                 legal_moves.append(move)
         return legal_moves
 
+    @staticmethod
+    def generate_candidate_moves(board: GoBoard, color: GO_COLOR) -> List:
+        """
+        generate a list of the legal moves close to a stone,
+        see GoBoard.get_candidate_points.
+        All legal moves if no stone has been played.
+        Does not include the Pass move.
+        """
+        return [move for move in board.get_candidate_points() if board.is_legal(move, color)]
+
     @staticmethod
     def generate_random_move(board: GoBoard, color: GO_COLOR, 
                              use_eye_filter: bool) -> GO_POINT:
@@ -1,3 +1,5 @@
+import threading
+
 from board_base import GO_POINT
 from board import GoBoard
 
@@ -23,3 +25,10 @@ class GoEngine:
     def set_policy(self, policy_type: str) -> None:
         self.policy_type = policy_type
 
+    def ponder(self, board: GoBoard, stop: threading.Event) -> None:
+        """
+        Think about board in the background until stop is set.
+        Engines that do not ponder return immediately.
+        """
+        pass
+
@@ -11,6 +11,7 @@ at the University of Edinburgh.
 import traceback
 import numpy as np
 import re
+import threading
 from sys import stdin, stdout, stderr
 from typing import Any, Callable, Dict, List, Tuple
 
@@ -28,6 +29,7 @@ from board_base import (
 from board import GoBoard
 from board_util import GoBoardUtil
 from engine import GoEngine
+from solver import WIN, LOSS
 
 class GtpConnection:
     def __init__(self, go_engine: GoEngine, board: GoBoard, debug_mode: bool = False) -> None:
@@ -42,6 +44,7 @@ class GtpConnection:
             Represents the current board state.
         """
         self._debug_mode: bool = debug_mode
+        self._pondering: bool = False
         self.go_engine = go_engine
         self.board: GoBoard = board
         self.commands: Dict[str, Callable[[List[str]], None]] = {
@@ -69,7 +72,10 @@ class GtpConnection:
             "timelimit": self.timelimit_cmd,
             "solve": self.solve_cmd,
             "policy": self.policy_type_cmd,
-            "policy_moves": self.policy_moves_cmd
+            "policy_moves": self.policy_moves_cmd,
+            "ponder": self.ponder_cmd,
+            "workers": self.workers_cmd,
+            "analyze_moves": self.analyze_moves_cmd
         }
 
         # argmap is used for argument checking
@@ -82,6 +88,10 @@ class GtpConnection:
             "genmove": (1, "Usage: genmove {w,b}"),
             "play": (2, "Usage: play {b,w} MOVE"),
             "legal_moves": (1, "Usage: legal_moves {w,b}"),
+            "ponder": (1, "Usage: ponder {on,off}"),
+            "timelimit": (1, "Usage: timelimit INT"),
+            "workers": (1, "Usage: workers INT"),
+            "analyze_moves": (1, "Usage: analyze_moves INT"),
         }
 
     def write(self, data: str) -> None:
@@ -95,10 +105,27 @@ class GtpConnection:
         Start a GTP connection. 
         This function continuously monitors standard input for commands.
         """
-        line = stdin.readline()
+        line = self.read_line()
         while line:
             self.get_cmd(line)
-            line = stdin.readline()
+            line = self.read_line()
+
+    def read_line(self) -> str:
+        """
+        Wait for the next command line.
+        If pondering is on, the engine thinks about the current board
+        in a background thread until the line arrives.
+        """
+        if not self._pondering:
+            return stdin.readline()
+        stop = threading.Event()
+        worker = threading.Thread(target=self.go_engine.ponder,
+                                  args=(self.board.copy(), stop), daemon=True)
+        worker.start()
+        line = stdin.readline()
+        stop.set()
+        worker.join()
+        return line
 
     def get_cmd(self, command: str) -> None:
         """
@@ -390,18 +417,73 @@ class GtpConnection:
 
     
     def timelimit_cmd(self, args: List[str]) -> None:
-        """ Implement this function for Assignment 2 """
-        pass
+        """ Set the time limit in seconds for genmove """
+        self.go_engine.set_time_limit(int(args[0]))
+        self.respond()
 
     def solve_cmd(self, args: List[str]) -> None:
-        """ Implement this function for Assignment 2 """
-        pass
+        """
+        Solve the current position for the player to move:
+        responds with the winner b, w or draw, followed by the winning
+        or drawing move if there is one, or unknown on timeout
+        """
+        winner, move = self.go_engine.solve(self.board)
+        if move is None:
+            self.respond(winner)
+        else:
+            move_coord = point_to_coord(move, self.board.size)
+            self.respond(winner + " " + format_point(move_coord).lower())
 
     def policy_type_cmd(self, args: List[str]) -> None:
         """ Sets the engine's policy type, either "random" or "rule_based" """
         self.go_engine.set_policy(args[0])
         self.respond()
 
+    def ponder_cmd(self, args: List[str]) -> None:
+        """ Switch pondering on or off: ponder {on,off} """
+        if args[0] not in ["on", "off"]:
+            self.error("Usage: ponder {on,off}")
+            return
+        self._pondering = args[0] == "on"
+        self.respond()
+
+    def workers_cmd(self, args: List[str]) -> None:
+        """ Set the number of processes used for simulations """
+        try:
+            num_workers = int(args[0])
+        except ValueError:
+            num_workers = 0
+        if num_workers < 1:
+            self.error("Usage: workers INT")
+            return
+        self.go_engine.set_num_workers(num_workers)
+        self.respond()
+
+    def analyze_moves_cmd(self, args: List[str]) -> None:
+        """
+        Analyze the N best moves for the player to move in one search:
+        responds with one line per move, best first, with the move, its
+        win rate, its number of simulations and its proven value
+        win, loss or unknown
+        """
+        try:
+            num_moves = int(args[0])
+        except ValueError:
+            num_moves = 0
+        if num_moves < 1:
+            self.error("Usage: analyze_moves INT")
+            return
+        self.go_engine.set_policy("rule_based")
+        color = self.board.current_player
+        lines = []
+        for move, win_rate, visits, proven in self.go_engine.analyze_moves(
+                self.board, color, num_moves):
+            move_as_string = format_point(point_to_coord(move, self.board.size)).lower()
+            proven_as_string = {WIN: "win", LOSS: "loss"}.get(proven, "unknown")
+            lines.append("{} {:.3f} {} {}".format(move_as_string, win_rate, visits,
+                                                  proven_as_string))
+        self.respond("\n".join(lines))
+
     def policy_moves_cmd(self, args: List[str]) -> None:
         Movetype, moves = self.go_engine.generate_policy_moves(self.board, self.board.current_player)
         # print(moves)
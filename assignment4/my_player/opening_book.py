@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+"""
+opening_book.py
+Opening book for the simulation player.
+
+The book maps positions to moves. Positions are keyed by a canonical
+Zobrist hash: the smallest hash over the 8 symmetries of the board,
+combined with the player to move and the capture counts. Moves are
+stored in the same canonical orientation.
+
+File format, all little endian:
+    header:  magic b"NBK1", uint32 board size, uint32 number of entries
+    keys:    uint64 canonical keys, sorted
+    moves:   int16 canonical moves, in the order of the keys
+
+The file is memory-mapped on the first lookup, so loading costs nothing
+at startup and only the pages touched by the binary search are read.
+
+The book is built offline by self-play:
+    python3 opening_book.py --size 7 --games 20 --depth 6 --out opening_book.bin
+"""
+
+import argparse
+import os
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from board_base import GO_POINT, BLACK, WHITE
+from board import GoBoard, ZOBRIST_KEYS, ZOBRIST_SEED
+
+BOOK_MAGIC: bytes = b"NBK1"
+HEADER_SIZE: int = 12
+DEFAULT_BOOK_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                      "opening_book.bin")
+
+ZOBRIST: np.ndarray = np.array(ZOBRIST_KEYS, dtype=np.uint64)
+"""
+Keys for the player to move and the capture counts, indexed by
+[current player][black captures][white captures], captures capped at 10.
+"""
+STATE_KEYS: np.ndarray = np.random.default_rng(ZOBRIST_SEED + 1).integers(
+    1, 2**63, size=(3, 11, 11), dtype=np.int64).astype(np.uint64)
+
+
+def symmetry_maps(size: int) -> List[np.ndarray]:
+    """
+    Returns the 8 symmetries of a size x size board as arrays that map
+    each point of the padded 1D board to its image. BORDER points map to themselves.
+    """
+    NS = size + 1
+    base = np.arange(size * size + 3 * NS, dtype=np.int64)
+    maps = []
+    for flip in (False, True):
+        for rotations in range(4):
+            m = base.copy()
+            for row in range(1, size + 1):
+                for col in range(1, size + 1):
+                    r, c = row, col
+                    if flip:
+                        c = size + 1 - c
+                    for _ in range(rotations):
+                        r, c = c, size + 1 - r
+                    m[NS * row + col] = NS * r + c
+            maps.append(m)
+    return maps
+
+
+def inverse_maps(maps: List[np.ndarray]) -> List[np.ndarray]:
+    inverses = []
+    for m in maps:
+        inverse = np.empty_like(m)
+        inverse[m] = np.arange(len(m))
+        inverses.append(inverse)
+    return inverses
+
+
+def canonical_key(board: GoBoard, maps: List[np.ndarray]) -> Tuple[int, int]:
+    """
+    Returns the canonical key of board and the index of the symmetry
+    in maps that produces it.
+    """
+    stones = np.nonzero((board.board == BLACK) | (board.board == WHITE))[0]
+    colors = board.board[stones]
+    state = STATE_KEYS[board.current_player,
+                       min(board.black_captures, 10), min(board.white_captures, 10)]
+    best_key, best_sym = None, 0
+    for sym, m in enumerate(maps):
+        key = int(np.bitwise_xor.reduce(ZOBRIST[colors, m[stones]], initial=np.uint64(0)) ^ state)
+        if best_key is None or key < best_key:
+            best_key, best_sym = key, sym
+    return best_key, best_sym
+
+
+class OpeningBook(object):
+    def __init__(self, path: str = DEFAULT_BOOK_PATH) -> None:
+        """
+        Book stored in the file path.
+        Nothing is read until the first lookup. A missing file is an empty book.
+        """
+        self.path: str = path
+        self._loaded: bool = False
+        self._size: int = 0
+        self._keys: Optional[np.ndarray] = None
+        self._moves: Optional[np.ndarray] = None
+        self._maps: Dict[int, Tuple[List[np.ndarray], List[np.ndarray]]] = {}
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[:4] != BOOK_MAGIC:
+            return
+        size, count = np.frombuffer(header, dtype="<u4", offset=4, count=2)
+        if count == 0:
+            return
+        self._size = int(size)
+        self._keys = np.memmap(self.path, dtype="<u8", mode="r",
+                               offset=HEADER_SIZE, shape=(int(count),))
+        self._moves = np.memmap(self.path, dtype="<i2", mode="r",
+                                offset=HEADER_SIZE + 8 * int(count), shape=(int(count),))
+
+    def _symmetries(self, size: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        if size not in self._maps:
+            maps = symmetry_maps(size)
+            self._maps[size] = (maps, inverse_maps(maps))
+        return self._maps[size]
+
+    def lookup(self, board: GoBoard) -> Optional[GO_POINT]:
+        """
+        Returns the book move for the player to move on board,
+        or None if the position is not in the book.
+        """
+        if not self._loaded:
+            self._load()
+        if self._keys is None or board.size != self._size:
+            return None
+        maps, inverses = self._symmetries(board.size)
+        key, sym = canonical_key(board, maps)
+        i = int(np.searchsorted(self._keys, np.uint64(key)))
+        if i >= len(self._keys) or int(self._keys[i]) != key:
+            return None
+        move = GO_POINT(inverses[sym][int(self._moves[i])])
+        if not board.is_legal(move, board.current_player):
+            return None
+        return move
+
+
+def write_book(path: str, size: int, entries: Dict[int, int]) -> None:
+    """
+    Write entries, a map from canonical key to canonical move, to path
+    """
+    keys = np.array(sorted(entries), dtype="<u8")
+    moves = np.array([entries[int(key)] for key in keys], dtype="<i2")
+    with open(path, "wb") as f:
+        f.write(BOOK_MAGIC)
+        f.write(np.array([size, len(keys)], dtype="<u4").tobytes())
+        f.write(keys.tobytes())
+        f.write(moves.tobytes())
+
+
+def build_book(path: str, size: int, num_games: int, depth: int) -> int:
+    """
+    Play num_games self-play games of depth moves with the rule-based
+    simulation player, and store the most frequent move chosen in each
+    position in a book at path.
+    Returns the number of positions in the book.
+    """
+    from Ninuki import Go0
+    engine = Go0()
+    engine.set_policy("rule_based")
+    maps = symmetry_maps(size)
+    choices: Dict[int, Counter] = {}
+    for game in range(num_games):
+        board = GoBoard(size)
+        for ply in range(depth):
+            if board.end_of_game():
+                break
+            color = board.current_player
+            engine.start_clock()
+            move = engine.policy_simulation(board, color)
+            key, sym = canonical_key(board, maps)
+            choices.setdefault(key, Counter())[int(maps[sym][move])] += 1
+            board.play_move(move, color)
+    entries = {key: counter.most_common(1)[0][0] for key, counter in choices.items()}
+    write_book(path, size, entries)
+    return len(entries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build an opening book by self-play")
+    parser.add_argument("--size", type=int, default=7, help="board size")
+    parser.add_argument("--games", type=int, default=20, help="number of self-play games")
+    parser.add_argument("--depth", type=int, default=6, help="number of moves per game")
+    parser.add_argument("--out", default=DEFAULT_BOOK_PATH, help="book file")
+    args = parser.parse_args()
+    count = build_book(args.out, args.size, args.games, args.depth)
+    print("wrote {} positions to {}".format(count, args.out))
+
+
+if __name__ == "__main__":
+    main()
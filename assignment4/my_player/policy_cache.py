@@ -0,0 +1,62 @@
+"""
+policy_cache.py
+Bounded LRU cache for the results of the rule-based playout policy.
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+DEFAULT_POLICY_CACHE_SIZE: int = 100000
+
+
+class PolicyCache(object):
+    def __init__(self, size: int = DEFAULT_POLICY_CACHE_SIZE) -> None:
+        """
+        Creates an empty cache that holds at most size entries.
+        When full, the least recently used entry is dropped.
+        """
+        assert size >= 0
+        self.size: int = size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the value stored for key, or None if it is not cached
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.size == 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def resize(self, size: int) -> None:
+        """
+        Change the maximum number of entries, dropping the oldest ones if needed
+        """
+        assert size >= 0
+        self.size = size
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drop all entries and reset the hit and miss counters
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
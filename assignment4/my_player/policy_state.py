@@ -0,0 +1,61 @@
+"""
+policy_state.py
+Incremental state for the pattern search of the rule-based policy.
+
+The rule-based policy matches its patterns against every row, column
+and diagonal of the board. A move only changes the lines through the
+played point and through the captured stones, so the matches of all
+other lines can be reused.
+"""
+
+from typing import Dict, List, Tuple
+
+from board_base import GO_COLOR, GO_POINT
+from board import GoBoard, kmp_search
+
+
+class PolicyState(object):
+    def __init__(self, board: GoBoard) -> None:
+        """
+        Creates an empty state for the lines of board.
+        Attach it with board.policy_state = PolicyState(board);
+        board.play_move then invalidates the lines it changes,
+        and board.copy copies the state.
+        """
+        self.point_lines: Dict[GO_POINT, List[int]] = board.point_lines
+        # per line: id of a pattern list -> matches in that line
+        self.matches: List[Dict[int, List[Tuple]]] = [{} for _ in board.lines]
+
+    def copy(self) -> 'PolicyState':
+        state = PolicyState.__new__(PolicyState)
+        state.point_lines = self.point_lines
+        state.matches = [line_matches.copy() for line_matches in self.matches]
+        return state
+
+    def touch(self, point: GO_POINT) -> None:
+        """
+        Forget the matches of all lines through point
+        """
+        for index in self.point_lines.get(point, []):
+            self.matches[index] = {}
+
+    def search(self, board: GoBoard, patterns: List[List[GO_COLOR]]) -> List[Tuple]:
+        """
+        Returns the matches of patterns on board, in the format of search_patterns.
+        Only lines changed since the last search for patterns are searched.
+        """
+        key = id(patterns)
+        results: List[Tuple] = []
+        for index, line_matches in enumerate(self.matches):
+            found = line_matches.get(key)
+            if found is None:
+                text = board.line_colors(index)
+                found = []
+                for pattern in patterns:
+                    result = kmp_search(pattern, text, index)
+                    if result:
+                        found.append(result)
+                line_matches[key] = found
+            results.extend(found)
+        return results
+
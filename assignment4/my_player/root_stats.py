@@ -0,0 +1,138 @@
+"""
+root_stats.py
+Win and visit statistics for the moves at the root of a simulation search.
+
+Besides the normal Monte Carlo counts, all-moves-as-first (AMAF) counts
+are kept: a simulation counts for every point that the root player
+played during it. The two are blended as in RAVE.
+
+The counts are stored in numpy arrays indexed by board point, using the
+same padded 1D encoding as GoBoard.board.
+The arrays can live in an external buffer such as a
+multiprocessing.shared_memory block, so that several processes
+can record simulations without sending their counts back.
+"""
+
+import math
+import numpy as np
+from typing import Iterable, List, Optional
+
+from board_base import GO_POINT, PASS
+
+"""
+Number of count arrays: visits, wins, AMAF visits and AMAF wins
+"""
+NUM_COUNTS: int = 4
+
+
+class RootStats(object):
+    def __init__(self, maxpoint: int, buffer: Optional[memoryview] = None,
+                 block: int = 0) -> None:
+        """
+        Creates statistics for a board with maxpoint array elements.
+        Without a buffer the statistics are empty.
+        With a buffer, the counts are views into block number block of it,
+        each block taking RootStats.nbytes(maxpoint) bytes.
+        """
+        self.maxpoint: int = maxpoint
+        if buffer is None:
+            counts = np.zeros((NUM_COUNTS, maxpoint), dtype=np.float64)
+        else:
+            counts = np.ndarray((NUM_COUNTS, maxpoint), dtype=np.float64, buffer=buffer,
+                                offset=block * RootStats.nbytes(maxpoint))
+        self.visits: np.ndarray = counts[0]
+        self.wins: np.ndarray = counts[1]
+        self.amaf_visits: np.ndarray = counts[2]
+        self.amaf_wins: np.ndarray = counts[3]
+
+    @staticmethod
+    def nbytes(maxpoint: int) -> int:
+        """
+        Size of the buffer block used by statistics for maxpoint array elements
+        """
+        return NUM_COUNTS * maxpoint * np.dtype(np.float64).itemsize
+
+    def add(self, move: GO_POINT, win: bool) -> None:
+        """
+        Record the result of one simulation that started with move
+        """
+        self.visits[move] += 1
+        if win:
+            self.wins[move] += 1
+
+    def add_amaf(self, played: Iterable[GO_POINT], win: bool) -> None:
+        """
+        Record the result of one simulation in the AMAF counts
+        of every point in played
+        """
+        points = list(set(played))
+        self.amaf_visits[points] += 1
+        if win:
+            self.amaf_wins[points] += 1
+
+    def merge(self, other: 'RootStats') -> None:
+        """
+        Add the counts of other to these statistics
+        """
+        assert other.maxpoint == self.maxpoint
+        self.visits += other.visits
+        self.wins += other.wins
+        self.amaf_visits += other.amaf_visits
+        self.amaf_wins += other.amaf_wins
+
+    def win_rate(self, move: GO_POINT) -> float:
+        if self.visits[move] == 0:
+            return 0.0
+        return float(self.wins[move] / self.visits[move])
+
+    def rave_value(self, move: GO_POINT, equivalence: float) -> float:
+        """
+        Blend of the win rate and the AMAF win rate of move.
+        The weight of the AMAF rate is sqrt(k / (3n + k)) for n simulations
+        and k = equivalence, so it fades out as real simulations accumulate.
+        """
+        if equivalence <= 0 or self.amaf_visits[move] == 0:
+            return self.win_rate(move)
+        beta = math.sqrt(equivalence / (3 * self.visits[move] + equivalence))
+        amaf_rate = self.amaf_wins[move] / self.amaf_visits[move]
+        return float((1 - beta) * self.win_rate(move) + beta * amaf_rate)
+
+    def best_move(self, moves: List[GO_POINT], equivalence: float = 0) -> GO_POINT:
+        """
+        Return the move from moves with the highest win rate, blended with
+        AMAF if equivalence > 0.
+        Ties are broken by the order of moves.
+        """
+        if len(moves) == 0:
+            return PASS
+        return max(moves, key=lambda move: self.rave_value(move, equivalence))
+
+    def confidence_radius(self, move: GO_POINT, num_moves: int, delta: float) -> float:
+        """
+        Hoeffding bound on the error of the win rate of move.
+        The bound holds for all num_moves moves at the same time
+        with probability at least 1 - delta.
+        """
+        if self.visits[move] == 0:
+            return math.inf
+        return math.sqrt(math.log(2 * num_moves / delta) / (2 * self.visits[move]))
+
+    def confident_best(self, moves: List[GO_POINT], delta: float) -> Optional[GO_POINT]:
+        """
+        Return the move with the highest win rate if, with probability
+        at least 1 - delta, it is better than all other moves.
+        Return None if the moves are not yet separated.
+        """
+        if len(moves) == 0:
+            return None
+        best = self.best_move(moves)
+        if len(moves) == 1:
+            return best
+        lower = self.win_rate(best) - self.confidence_radius(best, len(moves), delta)
+        for move in moves:
+            if move == best:
+                continue
+            upper = self.win_rate(move) + self.confidence_radius(move, len(moves), delta)
+            if upper >= lower:
+                return None
+        return best
@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+"""
+softmax_policy.py
+Softmax playout policy over per-point features.
+
+Instead of the fixed priority order of the rule-based policy, every
+empty point gets a score: the sum of the weights of its features, such
+as "completes a five", "blocks an open four" or "next to the last move".
+Moves are sampled with probability proportional to exp(score).
+
+The weights are fit offline by maximum likelihood (conditional logistic
+regression) on the moves chosen by the simulation player in self-play:
+    python3 softmax_policy.py --size 7 --games 10 --out softmax_weights.npy
+Without a weights file, hand-set weights that follow the priority
+order of the rule-based policy are used.
+"""
+
+import argparse
+import os
+import numpy as np
+from typing import List, Optional, Tuple
+
+from board_base import GO_COLOR, GO_POINT, NO_POINT, PASS, opponent
+from board import GoBoard
+
+FEATURE_NAMES: List[str] = [
+    "win",              # completes a five, or a capture that wins
+    "block_win",        # blocks a five of the opponent
+    "open_four",        # makes an open four
+    "block_open_four",  # blocks an open four of the opponent
+    "capture",          # captures a pair
+    "protect",          # saves a pair from capture
+    "near_last_move",   # next to the last move
+    "near_stone",       # within CANDIDATE_DISTANCE of a stone
+]
+NUM_FEATURES: int = len(FEATURE_NAMES)
+DEFAULT_WEIGHTS: np.ndarray = np.array([12.0, 9.0, 6.0, 5.0, 3.0, 2.0, 1.0, 1.0])
+DEFAULT_WEIGHTS_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                         "softmax_weights.npy")
+
+
+class SoftmaxPolicy(object):
+    def __init__(self, weights: Optional[np.ndarray] = None,
+                 path: str = DEFAULT_WEIGHTS_PATH) -> None:
+        """
+        Policy with the given weights, or the weights stored in path,
+        or DEFAULT_WEIGHTS if there is no such file
+        """
+        if weights is None and os.path.isfile(path):
+            weights = np.load(path)
+        if weights is None:
+            weights = DEFAULT_WEIGHTS
+        assert weights.shape == (NUM_FEATURES,)
+        self.weights: np.ndarray = np.asarray(weights, dtype=np.float64)
+
+    def features(self, board: GoBoard, color: GO_COLOR) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the empty points of board and their feature matrix,
+        one row per point and one column per entry of FEATURE_NAMES,
+        for color to play
+        """
+        points = board.get_empty_points()
+        O = opponent(color)
+        F = np.zeros((len(points), NUM_FEATURES), dtype=np.float64)
+        F[:, 0] = np.isin(points, board.win_search(color))
+        F[:, 1] = np.isin(points, board.block_win(color))
+        F[:, 2] = np.isin(points, board.open_four(color))
+        F[:, 3] = np.isin(points, board.open_four(O))
+        F[:, 4] = np.isin(points, board.capture(color))
+        F[:, 5] = np.isin(points, board.protect(color))
+        if board.last_move not in (PASS, NO_POINT):
+            last = board.last_move
+            F[:, 6] = np.abs(points // board.NS - last // board.NS) <= 1
+            F[:, 6] *= np.abs(points % board.NS - last % board.NS) <= 1
+        F[:, 7] = board.nearby_stones[points] > 0
+        return points, F
+
+    def probabilities(self, board: GoBoard, color: GO_COLOR) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the empty points of board and the probability of each
+        """
+        points, F = self.features(board, color)
+        return points, softmax(F @ self.weights)
+
+    def sample(self, board: GoBoard, color: GO_COLOR) -> GO_POINT:
+        """
+        Sample a move for color, or PASS if the board is full
+        """
+        points, F = self.features(board, color)
+        if len(points) == 0:
+            return PASS
+        logits = F @ self.weights
+        cumulative = np.cumsum(np.exp(logits - logits.max()))
+        return points[np.searchsorted(cumulative, np.random.random() * cumulative[-1], side="right")]
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    e = np.exp(logits - logits.max())
+    return e / e.sum()
+
+
+def fit(samples: List[Tuple[np.ndarray, int]], epochs: int = 300,
+        learning_rate: float = 0.5, l2: float = 1e-3) -> np.ndarray:
+    """
+    Fit softmax weights by gradient ascent on the log-likelihood of the
+    chosen moves, with L2 regularization.
+    samples holds (feature matrix of the legal moves, index of the chosen move).
+    """
+    F = np.concatenate([features for features, _ in samples])
+    sizes = np.array([len(features) for features, _ in samples])
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    chosen = F[starts + np.array([index for _, index in samples])]
+    groups = np.repeat(np.arange(len(samples)), sizes)
+    weights = np.zeros(NUM_FEATURES)
+    for _ in range(epochs):
+        logits = F @ weights
+        logits -= np.maximum.reduceat(logits, starts)[groups]
+        e = np.exp(logits)
+        p = e / np.add.reduceat(e, starts)[groups]
+        expected = np.add.reduceat(p[:, None] * F, starts)
+        gradient = (chosen - expected).mean(axis=0) - l2 * weights
+        weights += learning_rate * gradient
+    return weights
+
+
+def collect_samples(size: int, num_games: int) -> List[Tuple[np.ndarray, int]]:
+    """
+    Play num_games self-play games with the simulation player and return
+    the features of every position with the index of the chosen move
+    """
+    from Ninuki import Go0
+    engine = Go0()
+    engine.set_policy("rule_based")
+    policy = SoftmaxPolicy(weights=DEFAULT_WEIGHTS)
+    samples = []
+    for game in range(num_games):
+        board = GoBoard(size)
+        while not board.end_of_game():
+            color = board.current_player
+            engine.start_clock()
+            move = engine.policy_simulation(board, color)
+            points, F = policy.features(board, color)
+            index = np.nonzero(points == move)[0]
+            if len(index) == 1:
+                samples.append((F, int(index[0])))
+            board.play_move(move, color)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit softmax policy weights by self-play")
+    parser.add_argument("--size", type=int, default=7, help="board size")
+    parser.add_argument("--games", type=int, default=10, help="number of self-play games")
+    parser.add_argument("--out", default=DEFAULT_WEIGHTS_PATH, help="weights file")
+    args = parser.parse_args()
+    samples = collect_samples(args.size, args.games)
+    weights = fit(samples)
+    np.save(args.out, weights)
+    for name, weight in zip(FEATURE_NAMES, weights):
+        print("{:16} {:.3f}".format(name, weight))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+solver.py
+Exact win/loss/draw solver for Ninuki positions.
+
+The solver runs iterative deepening alpha-beta, using GoBoard.play_move
+and GoBoard.undo on a single board and a transposition table keyed by
+the incremental Zobrist hash. It stops at the first depth that proves
+the result, or when the time limit is reached.
+It is meant for positions with few empty points, where it is both
+faster and more reliable than simulations.
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+from board_base import GO_COLOR, GO_POINT, PASS
+from board import GoBoard
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+"""
+Number of nodes between two checks of the clock
+"""
+TIME_CHECK_INTERVAL: int = 256
+DEFAULT_TT_SIZE: int = 1000000
+"""
+Search depth stored in the transposition table for proven values
+"""
+PROVEN_DEPTH: int = 1000
+
+
+class SolverTimeout(Exception):
+    """ Raised inside the search when the time limit is reached """
+    pass
+
+
+class Solver(object):
+    def __init__(self, tt_size: int = DEFAULT_TT_SIZE) -> None:
+        """
+        Solver with a transposition table of at most tt_size entries.
+        Proven values do not depend on the search, so the table is kept
+        between calls and only cleared when it is full.
+        """
+        self.tt_size: int = tt_size
+        self.tt: Dict[Tuple[int, int, int, int, int], Tuple[int, int, GO_POINT, int]] = {}
+        self.nodes: int = 0
+        self.max_depth: int = 0
+        self._deadline: float = 0.0
+
+    def solve(self, board: GoBoard, time_limit: float) -> Tuple[Optional[int], GO_POINT]:
+        """
+        Solve board for the player to move by iterative deepening.
+        Returns (value, move) with value WIN, DRAW or LOSS and a move that
+        achieves it, or (None, PASS) if the time limit was reached.
+        """
+        self.nodes = 0
+        self._deadline = time.time() + time_limit
+        if len(self.tt) > self.tt_size:
+            self.tt.clear()
+        board = board.copy()
+        board.policy_state = None
+        self.max_depth = 1
+        try:
+            while True:
+                value, proven = self.negamax(board, LOSS, WIN, 0)
+                if proven:
+                    return value, self.tt[self._key(board)][2]
+                self.max_depth += 1
+        except SolverTimeout:
+            return None, PASS
+
+    def _key(self, board: GoBoard) -> Tuple[int, int, int, int, int]:
+        """
+        Table key of board. The table is kept between calls, and the
+        empty board hashes to 0 at every size, so the size is part of the key.
+        """
+        return (board.size, board.hash, board.black_captures, board.white_captures,
+                board.current_player)
+
+    def winning_move(self, board: GoBoard, color: GO_COLOR) -> GO_POINT:
+        """
+        Returns a move that wins immediately for color, by five in a row
+        or by reaching 10 captures, or PASS if there is none
+        """
+        wins = board.immediate_wins(color)
+        if len(wins) == 0:
+            return PASS
+        return wins[0]
+
+    def negamax(self, board: GoBoard, alpha: int, beta: int, depth: int) -> Tuple[int, bool]:
+        """
+        Alpha-beta search of board for the player to move, to self.max_depth.
+        The position is not terminal: the previous move did not win
+        and there is at least one empty point.
+        Positions at the depth limit count as DRAW.
+        Returns (value, proven), where proven tells whether the value is a
+        game-theoretic bound that does not depend on the depth limit.
+        """
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and time.time() > self._deadline:
+            raise SolverTimeout()
+
+        key = self._key(board)
+        remaining = self.max_depth - depth
+        best_move = PASS
+        entry = self.tt.get(key)
+        if entry is not None:
+            value, flag, best_move, entry_depth = entry
+            if entry_depth >= remaining and (
+                    flag == EXACT or
+                    (flag == LOWER_BOUND and value >= beta) or
+                    (flag == UPPER_BOUND and value <= alpha)):
+                return value, entry_depth == PROVEN_DEPTH
+
+        color = board.current_player
+        win = self.winning_move(board, color)
+        if win != PASS:
+            self.tt[key] = (WIN, EXACT, win, PROVEN_DEPTH)
+            return WIN, True
+        if remaining <= 0:
+            return DRAW, False
+
+        moves = list(board.get_empty_points())
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+
+        original_alpha = alpha
+        best_value = LOSS - 1
+        proven = True
+        for move in moves:
+            board.play_move(move, color)
+            if board.get_empty_points().size == 0:
+                value, child_proven = DRAW, True
+            else:
+                value, child_proven = self.negamax(board, -beta, -alpha, depth + 1)
+                value = -value
+            board.undo()
+            if value > best_value:
+                best_value = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                # a single proven refutation is enough
+                proven = child_proven
+                break
+            proven = proven and child_proven
+
+        if best_value <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_value >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt[key] = (best_value, flag, best_move, PROVEN_DEPTH if proven else remaining)
+        return best_value, proven
@@ -0,0 +1,195 @@
+"""
+threat_search.py
+Threat-space search for forced wins.
+
+The attacker only plays forcing moves: moves after which it has an
+immediate win (a four that must be blocked, or a capture that would
+reach 10 stones). The defender only tries the moves that can stop all
+of these threats: playing on a threat point, or capturing attacker stones.
+Any other defender move loses at once, so a win found this way is a
+proven win, even though only a tiny part of the game tree is searched.
+"""
+
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from board_base import EMPTY, GO_COLOR, GO_POINT, PASS, opponent
+from board import GoBoard
+from solver import WIN, LOSS
+
+DEFAULT_MAX_DEPTH: int = 10
+DEFAULT_NODE_LIMIT: int = 20000
+
+
+class ThreatSearchLimit(Exception):
+    """ Raised inside the search when the node or time limit is reached """
+    pass
+
+
+class ThreatSearch(object):
+    def __init__(self, max_depth: int = DEFAULT_MAX_DEPTH,
+                 node_limit: int = DEFAULT_NODE_LIMIT) -> None:
+        """
+        Search for forced wins with at most max_depth attacker moves,
+        visiting at most node_limit positions per search
+        """
+        self.max_depth: int = max_depth
+        self.node_limit: int = node_limit
+        self.nodes: int = 0
+        self._deadline: float = 0.0
+        self._attacker: GO_COLOR = EMPTY
+        self._tt: Dict[Tuple[int, int, int, int], Tuple[int, GO_POINT]] = {}
+
+    def search(self, board: GoBoard, time_limit: float) -> Optional[GO_POINT]:
+        """
+        Returns a move that starts a forced win for the player to move,
+        or None if no forced win was found within the limits.
+        """
+        self.nodes = 0
+        self._deadline = time.time() + time_limit
+        self._attacker = board.current_player
+        self._tt = {}
+        board = board.copy()
+        board.policy_state = None
+        try:
+            return self.attack(board, self.max_depth)
+        except ThreatSearchLimit:
+            return None
+
+    def check_move(self, board: GoBoard, move: GO_POINT, time_limit: float) -> Optional[int]:
+        """
+        Check move of the player to move on board with a bounded search.
+        Returns WIN if move starts a forced win, LOSS if the opponent has
+        a forced win after it, or None if neither was found within the limits.
+        """
+        self.nodes = 0
+        self._deadline = time.time() + time_limit
+        color = board.current_player
+        defender = opponent(color)
+        if move in board.immediate_wins(color):
+            return WIN
+        board = board.copy()
+        board.policy_state = None
+        board.play_move(move, color)
+        try:
+            self._attacker = color
+            self._tt = {}
+            threats = board.immediate_wins(color)
+            if len(threats) > 0 and len(board.immediate_wins(defender)) == 0 \
+                    and self.defend(board, threats, self.max_depth - 1):
+                return WIN
+            self._attacker = defender
+            self._tt = {}
+            if self.attack(board, self.max_depth) is not None:
+                return LOSS
+        except ThreatSearchLimit:
+            pass
+        return None
+
+    def _count_node(self) -> None:
+        self.nodes += 1
+        if self.nodes >= self.node_limit or \
+                (self.nodes % 64 == 0 and time.time() > self._deadline):
+            raise ThreatSearchLimit()
+
+    def attack(self, board: GoBoard, depth: int) -> Optional[GO_POINT]:
+        """
+        Attacker to move. Returns a winning forcing move, or None.
+        """
+        self._count_node()
+        attacker = self._attacker
+        wins = board.immediate_wins(attacker)
+        if len(wins) > 0:
+            return wins[0]
+        if depth <= 0:
+            return None
+
+        key = (board.hash, board.black_captures, board.white_captures, attacker)
+        entry = self._tt.get(key)
+        if entry is not None and (entry[1] != PASS or entry[0] >= depth):
+            return entry[1] if entry[1] != PASS else None
+
+        defender = opponent(attacker)
+        for move in self.forcing_candidates(board, attacker):
+            board.play_move(move, attacker)
+            threats = board.immediate_wins(attacker)
+            if len(threats) > 0 and len(board.immediate_wins(defender)) == 0 \
+                    and self.defend(board, threats, depth - 1):
+                board.undo()
+                self._tt[key] = (depth, move)
+                return move
+            board.undo()
+        self._tt[key] = (depth, PASS)
+        return None
+
+    def defend(self, board: GoBoard, threats: List[GO_POINT], depth: int) -> bool:
+        """
+        Defender to move against the attacker's immediate wins threats.
+        Returns True if every defence loses.
+        """
+        self._count_node()
+        attacker = self._attacker
+        defender = opponent(attacker)
+        for move in self.defence_candidates(board, threats, defender):
+            board.play_move(move, defender)
+            if len(board.immediate_wins(attacker)) == 0 and \
+                    self.attack(board, depth) is None:
+                board.undo()
+                return False
+            board.undo()
+        return True
+
+    def forcing_candidates(self, board: GoBoard, color: GO_COLOR) -> List[GO_POINT]:
+        """
+        Empty points that may create an immediate win for color:
+        points in a five-point window with three stones of color and
+        no other stones, capturing moves, and, when color has at least
+        8 captures, moves that threaten a capture.
+        """
+        O = opponent(color)
+        NS = board.NS
+        directions = [1, NS, NS + 1, NS - 1]
+        offsets = [1, -1, NS, -NS, NS + 1, -(NS + 1), NS - 1, -NS + 1]
+        capture_threats = board.get_captures(color) >= 8
+        candidates: List[GO_POINT] = []
+        for point in board.get_empty_points():
+            if self._in_open_window(board, point, color, directions) or \
+                    board.captures_by(point, color) > 0:
+                candidates.append(point)
+                continue
+            if capture_threats:
+                for offset in offsets:
+                    if board.board[point + offset] == O and \
+                            board.board[point + 2 * offset] == O and \
+                            board.board[point + 3 * offset] == EMPTY:
+                        candidates.append(point)
+                        break
+        return candidates
+
+    def _in_open_window(self, board: GoBoard, point: GO_POINT, color: GO_COLOR,
+                        directions: List[int]) -> bool:
+        for d in directions:
+            for start in range(-4, 1):
+                count = 0
+                for i in range(start, start + 5):
+                    c = board.board[point + i * d] if 0 <= point + i * d < board.maxpoint else None
+                    if c == color:
+                        count += 1
+                    elif c != EMPTY:
+                        count = -1
+                        break
+                if count >= 3:
+                    return True
+        return False
+
+    def defence_candidates(self, board: GoBoard, threats: List[GO_POINT],
+                           defender: GO_COLOR) -> List[GO_POINT]:
+        """
+        The only moves that can stop the threats: the threat points
+        themselves and the defender's capturing moves
+        """
+        candidates: Set[GO_POINT] = set(threats)
+        for point in board.get_empty_points():
+            if board.captures_by(point, defender) > 0:
+                candidates.add(point)
+        return list(candidates)